@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""Benchmark dragging a point through a chain of constrained points.
+
+Compares the dual simplex strategies of SimplexSolver, and the cost of
+adding and removing constraints on every frame with and without pooling
+of internal variables and rows:
+
+    python benchmarks/drag.py [points] [frames]
+
+The gc columns count the garbage collections (of each generation) that
+were triggered while the benchmark ran, and the variables column counts the
+variables that were allocated. The density column is the average row size
+of the tableau after the drag, and the fill in column counts the terms that
+pivots created in existing rows during the drag.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import gc
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cassowary import SimplexSolver, Variable, STRONG, WEAK
+from cassowary import expression
+from cassowary.expression import Constraint
+
+
+def collections():
+    "The number of garbage collections of each generation so far"
+    if not hasattr(gc, 'get_stats'):
+        # Python < 3.4
+        return (0, 0, 0)
+    return tuple(stats['collections'] for stats in gc.get_stats())
+
+
+def allocated_variables():
+    "The number of variables allocated so far"
+    # Peeking at the id counter uses up an id, which does no harm.
+    return next(expression.variable_ids)
+
+
+def build(n, dual_rule='first', harris_tolerance=None):
+    solver = SimplexSolver()
+    solver.dual_rule = dual_rule
+    solver.harris_tolerance = harris_tolerance
+
+    points = [Variable('p%s' % i, i * 10) for i in range(n)]
+    for p in points:
+        solver.add_stay(p, strength=WEAK)
+    for p, q in zip(points, points[1:]):
+        solver.add_constraint(Constraint(q, Constraint.GEQ, p + 10))
+    for p, q in zip(points, points[2:]):
+        solver.add_constraint(Constraint(q, Constraint.LEQ, p + 40, strength=STRONG))
+    solver.add_constraint(Constraint(points[0], Constraint.GEQ, 0))
+    solver.add_constraint(Constraint(points[-1], Constraint.LEQ, n * 20))
+    return solver, points
+
+
+def drag(n, frames, dual_rule, harris_tolerance):
+    solver, points = build(n, dual_rule, harris_tolerance)
+    handle = points[n // 2]
+    solver.add_edit_var(handle)
+
+    gc.collect()
+    before = collections()
+    fill_in = solver.fill_in
+    start = time.time()
+    with solver.edit():
+        for frame in range(frames):
+            solver.suggest_value(handle, n * 10 * (1 + math.sin(frame / 10.0)))
+            solver.resolve()
+    elapsed = time.time() - start
+    gcs = [after - before for after, before in zip(collections(), before)]
+
+    counts = list(solver.dual_pivot_counts)
+    return elapsed, counts, gcs, solver.density(), solver.fill_in - fill_in
+
+
+def churn(n, frames, pool_size):
+    """Add and remove a popover's constraints on every frame.
+
+    The popover is anchored to a point in the middle of the chain, and has
+    a preferred size; it is torn down again at the end of the frame.
+    """
+    solver, points = build(n)
+    solver.pool_size = pool_size
+    anchor = points[n // 2]
+    left = Variable('left')
+    width = Variable('width')
+
+    gc.collect()
+    before = collections()
+    variables = allocated_variables()
+    start = time.time()
+    for frame in range(frames):
+        constraints = [
+            Constraint(left, Constraint.GEQ, anchor + 5),
+            Constraint(left, Constraint.LEQ, anchor + 20, strength=STRONG),
+            Constraint(width, Constraint.EQ, 100 + frame % 50, strength=STRONG),
+            Constraint(left + width, Constraint.LEQ, n * 20),
+        ]
+        for cn in constraints:
+            solver.add_constraint(cn)
+        for cn in constraints:
+            solver.remove_constraint(cn)
+    elapsed = time.time() - start
+    gcs = [after - before for after, before in zip(collections(), before)]
+    variables = allocated_variables() - variables - 1
+    return elapsed, gcs, variables
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print('Dragging 1 of %s points for %s frames' % (n, frames))
+    print('%-16s %-8s %10s %12s %12s %10s %10s %12s %14s' % ('rule', 'harris', 'time (ms)', 'pivots', 'per resolve', 'max', 'density', 'fill in', 'gc (0/1/2)'))
+    for dual_rule in ['first', 'most_infeasible', 'steepest_edge']:
+        for harris_tolerance in [None, 1e-9]:
+            elapsed, counts, gcs, density, fill_in = drag(n, frames, dual_rule, harris_tolerance)
+            print('%-16s %-8s %10.1f %12d %12.2f %10d %10.2f %12d %14s' % (
+                dual_rule,
+                'yes' if harris_tolerance else 'no',
+                elapsed * 1000,
+                sum(counts),
+                sum(counts) / len(counts),
+                max(counts),
+                density,
+                fill_in,
+                '/'.join('%d' % count for count in gcs),
+            ))
+
+    print()
+    print('Adding and removing a popover on each of %s frames' % frames)
+    print('%-16s %10s %14s %12s' % ('pool size', 'time (ms)', 'gc (0/1/2)', 'variables'))
+    for pool_size in [0, 64]:
+        elapsed, gcs, variables = churn(n, frames, pool_size)
+        print('%-16s %10.1f %14s %12d' % (
+            pool_size,
+            elapsed * 1000,
+            '/'.join('%d' % count for count in gcs),
+            variables,
+        ))
+
+
+if __name__ == '__main__':
+    main()
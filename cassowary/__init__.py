@@ -1,9 +1,10 @@
 from __future__ import print_function, unicode_literals, absolute_import
 
-from .expression import Variable
+from .expression import Variable, Parameter
 from .error import RequiredFailure, ConstraintNotFound, InternalError
+from .solution import Solution
 from .simplex_solver import SimplexSolver
-from .utils import REQUIRED, STRONG, MEDIUM, WEAK
+from .utils import REQUIRED, STRONG, MEDIUM, WEAK, SymbolicWeight
 
 # Examples of valid version strings
 # __version__ = '1.2.3.dev1'  # Development release 1
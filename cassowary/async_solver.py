@@ -0,0 +1,99 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import asyncio
+
+try:
+    get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # For Python 3.5 and 3.6 compatibility; get_event_loop() returns the
+    # running loop when it is called from a coroutine.
+    get_running_loop = asyncio.get_event_loop
+
+
+class AsyncSolver(object):
+    """An asyncio front end to a SimplexSolver.
+
+    Coroutines suggest values for edit variables and read back solved
+    values. All the suggestions that arrive within one tick of the event
+    loop are applied together, with a single resolve; every coroutine that
+    is waiting is then answered from that one solution.
+
+    Any variable passed to suggest() becomes an edit variable of the
+    underlying solver, and stays one until close() is called. While the
+    front end is in use, the solver shouldn't be modified directly.
+    """
+    def __init__(self, solver):
+        self.solver = solver
+
+        # Map of variable to the most recent suggested value.
+        self.pending = {}
+        # List of (future, variables) pairs waiting on the next resolve.
+        self.waiters = []
+        self.scheduled = False
+
+        # The edit variables that were added by this front end.
+        self.edit_vars = []
+
+        self.flush_count = 0
+
+    async def suggest(self, var, value):
+        """Suggest a value for a variable.
+
+        Returns once the suggestion has been applied. If several
+        suggestions for the same variable arrive in one tick, the last one
+        wins.
+        """
+        self.pending[var] = value
+        await self._wait()
+
+    async def values(self, variables):
+        """Return the values of a list of variables.
+
+        If any suggestions are pending, the values are read after those
+        suggestions have been applied.
+        """
+        if self.scheduled:
+            return await self._wait(variables)
+        return [v.value for v in variables]
+
+    def close(self):
+        "Remove the edit variables that were added by this front end"
+        for var in self.edit_vars:
+            self.solver.remove_edit_var(var)
+        self.edit_vars = []
+
+    def _wait(self, variables=()):
+        loop = get_running_loop()
+        future = loop.create_future()
+        self.waiters.append((future, variables))
+        if not self.scheduled:
+            self.scheduled = True
+            loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        "Apply all pending suggestions with a single resolve"
+        pending, self.pending = self.pending, {}
+        waiters, self.waiters = self.waiters, []
+        self.scheduled = False
+
+        try:
+            if pending:
+                for var in pending:
+                    if var not in self.solver.edit_var_map:
+                        self.solver.add_edit_var(var)
+                        self.edit_vars.append(var)
+
+                for var, value in pending.items():
+                    self.solver.suggest_value(var, value)
+                self.solver.resolve()
+                self.flush_count = self.flush_count + 1
+        except Exception as e:
+            for future, variables in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, variables in waiters:
+            if not future.done():
+                future.set_result([v.value for v in variables])
@@ -0,0 +1,195 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from collections import deque
+
+from .utils import EPSILON
+
+INFINITY = float('inf')
+NO_REASONS = frozenset()
+
+###########################################################################
+# Bounds
+#
+# Interval bounds on variables, derived by propagating over the required
+# constraints. Every bound records the set of constraints that it was
+# derived from, so that a conflict found by propagation can be explained
+# in the same terms as a conflict found by the simplex solver.
+###########################################################################
+
+
+class Bounds(object):
+    """Interval bounds on variables, implied by a set of required constraints.
+
+    Propagation is incremental. When a constraint is removed, the bounds
+    that were derived from it are dropped, and the bounds on the variables
+    involved are propagated again from the constraints that remain.
+    """
+    def __init__(self, max_steps=1000):
+        # Maps of variable to (bound, reasons)
+        self.lower = {}
+        self.upper = {}
+
+        # Map of variable to the set of constraints that refer to it.
+        self.constraints = {}
+
+        # The maximum number of constraint visits per propagation. Cycles
+        # of constraints can tighten bounds by ever smaller amounts; when
+        # the limit is reached, propagation stops with the bounds that
+        # have been derived so far, which are still valid.
+        self.max_steps = max_steps
+
+    def __repr__(self):
+        return 'Bounds(%s)' % ', '.join(
+            '%s: [%s, %s]' % (v, self.lower_bound(v)[0], self.upper_bound(v)[0])
+            for v in self.constraints
+        )
+
+    @staticmethod
+    def is_eligible(cn):
+        "Can the constraint be used to derive bounds?"
+        if not cn.is_required or cn.is_edit_constraint:
+            return False
+        return not any(v.is_parameter for v in cn.expression.terms)
+
+    def lower_bound(self, v):
+        return self.lower.get(v, (-INFINITY, NO_REASONS))
+
+    def upper_bound(self, v):
+        return self.upper.get(v, (INFINITY, NO_REASONS))
+
+    def range(self, expr, exclude=None):
+        """The interval of values that expr can take.
+
+        Returns (low, low_reasons, high, high_reasons). If exclude is
+        provided, the term for that variable is ignored.
+        """
+        low = high = expr.constant
+        low_reasons = high_reasons = NO_REASONS
+        for v, c in expr.terms.items():
+            if v is exclude:
+                continue
+            lower, lower_reasons = self.lower_bound(v)
+            upper, upper_reasons = self.upper_bound(v)
+            if c > 0:
+                low = low + c * lower
+                high = high + c * upper
+                low_reasons = low_reasons | lower_reasons
+                high_reasons = high_reasons | upper_reasons
+            else:
+                low = low + c * upper
+                high = high + c * lower
+                low_reasons = low_reasons | upper_reasons
+                high_reasons = high_reasons | lower_reasons
+        return low, low_reasons, high, high_reasons
+
+    def add(self, cn):
+        """Add a constraint, and propagate the bounds it implies.
+
+        Returns (conflict, trail). If propagation proves that the
+        constraints are infeasible, conflict is the set of constraints
+        involved; otherwise it is None. The changes that were made can be
+        reverted by passing trail to undo().
+        """
+        for v in cn.expression.terms:
+            self.constraints.setdefault(v, set()).add(cn)
+        trail = [cn]
+        return self.propagate([cn], trail), trail
+
+    def remove(self, cn):
+        """Remove a constraint, and the bounds that were derived from it.
+
+        The reasons for a bound include the reasons for every bound it was
+        derived from, so the bounds that remain are implied by the other
+        constraints. Bounds that were replaced by the dropped ones are
+        recovered by propagating the constraints on the affected variables
+        again. Returns the conflict found by that propagation, if any.
+        """
+        for v in cn.expression.terms:
+            constraints = self.constraints.get(v)
+            if constraints is not None:
+                constraints.discard(cn)
+                if not constraints:
+                    del self.constraints[v]
+
+        affected = set()
+        for bounds in (self.lower, self.upper):
+            for v, (bound, reasons) in list(bounds.items()):
+                if cn in reasons:
+                    del bounds[v]
+                    affected.add(v)
+
+        queue = []
+        for v in sorted(affected, key=lambda v: v.id):
+            for other in self.constraints.get(v, ()):
+                if other not in queue:
+                    queue.append(other)
+        return self.propagate(queue, [cn])
+
+    def undo(self, trail):
+        "Revert a call to add()"
+        cn = trail[0]
+        for v in cn.expression.terms:
+            constraints = self.constraints[v]
+            constraints.discard(cn)
+            if not constraints:
+                del self.constraints[v]
+
+        for bounds, v, old in reversed(trail[1:]):
+            if old is None:
+                del bounds[v]
+            else:
+                bounds[v] = old
+
+    def propagate(self, constraints, trail):
+        queue = deque(constraints)
+        queued = set(queue)
+        steps = 0
+        while queue and steps < self.max_steps:
+            steps = steps + 1
+            cn = queue.popleft()
+            queued.discard(cn)
+            expr = cn.expression
+            for v, c in expr.terms.items():
+                # c * v + rest >= 0 (or == 0), so c * v >= -rest.
+                low, low_reasons, high, high_reasons = self.range(expr, exclude=v)
+                reasons = high_reasons | set([cn])
+                changed = False
+                if c > 0:
+                    changed = self.tighten_lower(v, -high / c, reasons, trail) or changed
+                else:
+                    changed = self.tighten_upper(v, -high / c, reasons, trail) or changed
+                if not cn.is_inequality:
+                    # ... and c * v <= -rest.
+                    reasons = low_reasons | set([cn])
+                    if c > 0:
+                        changed = self.tighten_upper(v, -low / c, reasons, trail) or changed
+                    else:
+                        changed = self.tighten_lower(v, -low / c, reasons, trail) or changed
+
+                lower, lower_reasons = self.lower_bound(v)
+                upper, upper_reasons = self.upper_bound(v)
+                if lower > upper + EPSILON:
+                    return lower_reasons | upper_reasons
+
+                if changed:
+                    for other in self.constraints[v]:
+                        if other not in queued:
+                            queue.append(other)
+                            queued.add(other)
+        return None
+
+    def tighten_lower(self, v, bound, reasons, trail):
+        old = self.lower.get(v)
+        if bound == -INFINITY or (old is not None and bound <= old[0] + EPSILON):
+            return False
+        trail.append((self.lower, v, old))
+        self.lower[v] = (bound, frozenset(reasons))
+        return True
+
+    def tighten_upper(self, v, bound, reasons, trail):
+        old = self.upper.get(v)
+        if bound == INFINITY or (old is not None and bound >= old[0] - EPSILON):
+            return False
+        trail.append((self.upper, v, old))
+        self.upper[v] = (bound, frozenset(reasons))
+        return True
@@ -2,18 +2,20 @@ from __future__ import print_function, unicode_literals, absolute_import, divisi
 
 
 class EditInfo(object):
-    def __init__(self, constraint, edit_plus, edit_minus, prev_edit_constant, index):
+    def __init__(self, constraint, edit_plus, edit_minus, prev_edit_constant, index, persistent=False):
         self.constraint = constraint
         self.edit_plus = edit_plus
         self.edit_minus = edit_minus
         self.prev_edit_constant = prev_edit_constant
         self.index = index
+        self.persistent = persistent
 
     def __repr__(self):
-        return '<cn=%s ep=%s em=%s pec=%s index=%s>' % (
+        return '<cn=%s ep=%s em=%s pec=%s index=%s%s>' % (
             self.constraint,
             self.edit_plus,
             self.edit_minus,
             self.prev_edit_constant,
-            self.index
+            self.index,
+            ' persistent' if self.persistent else ''
         )
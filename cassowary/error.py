@@ -14,4 +14,11 @@ class ConstraintNotFound(CassowaryException):
 
 
 class RequiredFailure(CassowaryException):
-    pass
+    """A required constraint couldn't be satisfied.
+
+    ``constraints`` is the set of required constraints that are involved in
+    the conflict, if known.
+    """
+    def __init__(self, *args, **kwargs):
+        self.constraints = kwargs.pop('constraints', [])
+        super(RequiredFailure, self).__init__(*args, **kwargs)
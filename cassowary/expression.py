@@ -1,22 +1,34 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
+import itertools
+
 from .error import InternalError
-from .utils import approx_equal, REQUIRED, STRONG, repr_strength
+from .utils import approx_equal, REQUIRED, STRONG, repr_strength, SymbolicWeight
 
 ###########################################################################
 # Variables
 #
 # Variables are the atomic unit of linear programming, describing the
 # quantities that are to be solved and constrained.
+#
+# Every variable is given an integer id, in order of creation. Wherever the
+# solver has to choose between variables, ties are broken by id, so the
+# choice doesn't depend on names, or on the iteration order of sets.
 ###########################################################################
 
+variable_ids = itertools.count(1)
+
+
 class AbstractVariable(object):
     def __init__(self, name):
+        self.id = next(variable_ids)
         self.name = name
         self.is_dummy = False
         self.is_external = False
         self.is_pivotable = False
         self.is_restricted = False
+        self.is_stay_error = False
+        self.is_parameter = False
 
     def __rmul__(self, x):
         return self.__mul__(x)
@@ -124,6 +136,22 @@ class Variable(AbstractVariable):
             return NotImplemented
 
 
+class Parameter(Variable):
+    """A named constant that can be shared between constraints.
+
+    A parameter can be used anywhere a variable can, but the solver treats
+    it as a constant. Changing its value with SimplexSolver.set_parameter()
+    updates every constraint that refers to it.
+    """
+    def __init__(self, name, value=0.0):
+        super(Parameter, self).__init__(name, value)
+        self.is_external = False
+        self.is_parameter = True
+
+    def __repr__(self):
+        return '%s[%s]:param' % (self.name, self.value)
+
+
 class DummyVariable(AbstractVariable):
     def __init__(self, number):
         super(DummyVariable, self).__init__(name='d%s' % (number))
@@ -160,10 +188,11 @@ class SlackVariable(AbstractVariable):
 
 class Expression(object):
     def __init__(self, variable=None, value=1.0, constant=0.0):
-        assert isinstance(constant, (float, int))
+        assert isinstance(constant, (float, int, SymbolicWeight))
         assert variable is None or isinstance(variable, AbstractVariable)
 
-        self.constant = float(constant)
+        # The objective row of a symbolic solver has a SymbolicWeight constant.
+        self.constant = constant if isinstance(constant, SymbolicWeight) else float(constant)
         self.terms = {}
 
         if variable:
@@ -355,7 +384,8 @@ class Expression(object):
                     solver.note_added_variable(v, subject)
 
     def set_variable(self, v, c):
-        self.terms[v] = float(c)
+        # Objective rows of a symbolic solver carry SymbolicWeight coefficients.
+        self.terms[v] = c if isinstance(c, SymbolicWeight) else float(c)
 
     def remove_variable(self, v):
         del self.terms[v]
@@ -452,6 +482,15 @@ class StayConstraint(AbstractConstraint):
     def __repr__(self):
         return 'stay:%s' % super(StayConstraint, self).__repr__()
 
+    def structure_key(self):
+        """A hashable key shared by every stay on the same variable.
+
+        A stay's constant follows the value of its variable, so only the
+        variable is part of the key. Returns (key, 1.0), like
+        Constraint.structure_key().
+        """
+        return ('stay', self.variable.id), 1.0
+
 
 class Constraint(AbstractConstraint):
     LEQ = -1
@@ -599,3 +638,40 @@ class Constraint(AbstractConstraint):
         c = Constraint(self.expression, strength=self.strength, weight=self.weight)
         c.is_inequality = self.is_inequality
         return c
+
+    def canonical_key(self):
+        """A hashable key that is shared by every equivalent constraint.
+
+        The terms are ordered by variable id. An equality is scaled so
+        that its first coefficient is positive; as the scale of a required
+        constraint doesn't matter, it is also scaled so that the first
+        coefficient is 1. The strength and weight are part of the key.
+        """
+        terms = sorted((v.id, c) for v, c in self.expression.terms.items())
+        scale = 1.0
+        if terms:
+            if self.is_required:
+                scale = abs(terms[0][1])
+            if not self.is_inequality and terms[0][1] < 0.0:
+                scale = -scale
+        return (
+            tuple((v, c / scale) for v, c in terms),
+            self.expression.constant / scale,
+            self.is_inequality,
+            SymbolicWeight.from_strength(self.strength).levels,
+            self.weight,
+        )
+
+    def structure_key(self):
+        """A hashable key for the terms and operator of the constraint.
+
+        Constraints with the same structure key differ at most in their
+        constant, strength and weight. Returns (key, sign); sign is -1.0 if
+        the constraint is an equality that had to be negated to make its
+        first coefficient positive, and 1.0 otherwise.
+        """
+        terms = sorted((v.id, c) for v, c in self.expression.terms.items())
+        sign = 1.0
+        if terms and not self.is_inequality and terms[0][1] < 0.0:
+            sign = -1.0
+        return (tuple((v, c * sign) for v, c in terms), self.is_inequality), sign
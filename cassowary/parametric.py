@@ -0,0 +1,146 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+###########################################################################
+# Parametric evaluation of edits
+#
+# While the basis of the tableau doesn't change, the constant of every
+# row is an affine function of the edit constants:
+#
+#     constant = base + sum(coefficient[i] * (edit[i] - base_edit[i]))
+#
+# AffineMap extracts those functions for the rows that an edit can affect,
+# so that a new set of edit values can be evaluated without touching the
+# tableau. The basis remains optimal for as long as it remains feasible.
+# That is the case while every restricted row has a non-negative constant,
+# so the restricted rows describe the range of edit values that the map
+# covers.
+###########################################################################
+
+
+class AffineMap(object):
+    """The affine map from the edit constants to the values of the variables.
+
+    The map is extracted from the current tableau, and is only valid until
+    the tableau is changed by anything other than suggest_value().
+    """
+    def __init__(self, solver):
+        self.edits = sorted(solver.edit_var_map.values(), key=lambda cei: cei.index)
+        # The edit constants that are reflected in the tableau.
+        self.base = [cei.prev_edit_constant for cei in self.edits]
+        # The edit constants of the most recent evaluation.
+        self.current = list(self.base)
+
+        # Map of basic variable to list of (edit index, coefficient).
+        terms = {}
+        for i, cei in enumerate(self.edits):
+            if cei.edit_plus in solver.rows:
+                terms.setdefault(cei.edit_plus, []).append((i, 1.0))
+            elif cei.edit_minus in solver.rows:
+                terms.setdefault(cei.edit_minus, []).append((i, -1.0))
+            else:
+                for basic_var in solver.columns.get(cei.edit_minus, ()):
+                    c = solver.rows[basic_var].coefficient_for(cei.edit_minus)
+                    terms.setdefault(basic_var, []).append((i, c))
+
+        # Lists of (variable, base constant, terms)
+        self.external_rows = []
+        self.restricted_rows = []
+        # Stay constants are reset after every solve, so a stay row only
+        # needs to stay feasible relative to the previous evaluation; list
+        # of (variable, terms).
+        self.stay_rows = []
+        for v, row_terms in terms.items():
+            constant = solver.rows[v].constant
+            if v.is_external:
+                self.external_rows.append((v, constant, row_terms))
+            elif v.is_stay_error:
+                self.stay_rows.append((v, row_terms))
+            elif v.is_restricted:
+                self.restricted_rows.append((v, constant, row_terms))
+
+    def __repr__(self):
+        return 'AffineMap(%s edits, %s external, %s restricted, %s stay rows)' % (
+            len(self.edits), len(self.external_rows), len(self.restricted_rows), len(self.stay_rows)
+        )
+
+    def evaluate(self):
+        """Set the values of the external variables for the current edit values.
+
+        Returns False, without setting any values, if the edit values are
+        outside the range of the map.
+        """
+        values = [cei.prev_edit_constant for cei in self.edits]
+        delta = [value - base for value, base in zip(values, self.base)]
+        step = [value - current for value, current in zip(values, self.current)]
+
+        for v, constant, terms in self.restricted_rows:
+            for i, c in terms:
+                constant = constant + c * delta[i]
+            if constant < 0.0:
+                return False
+
+        for v, terms in self.stay_rows:
+            constant = 0.0
+            for i, c in terms:
+                constant = constant + c * step[i]
+            if constant < 0.0:
+                return False
+
+        for v, constant, terms in self.external_rows:
+            for i, c in terms:
+                constant = constant + c * delta[i]
+            v.value = constant
+
+        self.current = values
+        return True
+
+    def limit(self, i):
+        """The largest value of edit i that the map covers.
+
+        The other edits are held at their current values, and edit i is
+        assumed to increase from its current value.
+        """
+        current = self.current[i]
+        for v, terms in self.stay_rows:
+            for j, c in terms:
+                if j == i and c < 0.0:
+                    return current
+
+        delta = [value - base for value, base in zip(self.current, self.base)]
+        limit = float('inf')
+        for v, constant, terms in self.restricted_rows:
+            rate = 0.0
+            for j, c in terms:
+                constant = constant + c * delta[j]
+                if j == i:
+                    rate = c
+            if rate < 0.0:
+                limit = min(limit, current - constant / rate)
+        return limit
+
+    def rates(self, i):
+        "Map of external variable to the rate at which it changes with edit i"
+        rates = {}
+        for v, constant, terms in self.external_rows:
+            for j, c in terms:
+                if j == i:
+                    rates[v] = c
+        return rates
+
+    def sync(self, solver):
+        """Bring the tableau up to date with the edit values.
+
+        The values of the most recent evaluation are applied first, and the
+        stay constants reset, as they would have been if each evaluation
+        had been a resolve. Any later suggestions are then applied as
+        pending changes, for the solver to resolve.
+        """
+        for cei, value, base in zip(self.edits, self.current, self.base):
+            if value != base:
+                solver.delta_edit_constant(value - base, cei.edit_plus, cei.edit_minus)
+        solver.infeasible_rows.clear()
+        solver.reset_stay_constants()
+
+        for cei, value in zip(self.edits, self.current):
+            if cei.prev_edit_constant != value:
+                solver.delta_edit_constant(cei.prev_edit_constant - value, cei.edit_plus, cei.edit_minus)
@@ -0,0 +1,156 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import struct
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8; a buffer (such as an mmap) must be provided explicitly.
+    shared_memory = None
+
+###########################################################################
+# Shared solution buffers
+#
+# A solution buffer makes the values of a fixed list of variables available
+# to other processes, without serialization. The buffer is laid out as:
+#
+#     sequence: uint64
+#     count:    uint64
+#     values:   float64 * count
+#
+# The writer increments the sequence number before and after writing the
+# values (a sequence lock), so the sequence number is odd while an update
+# is in progress. A reader that sees the same even sequence number before
+# and after reading the values has read a consistent solution.
+###########################################################################
+
+HEADER = struct.Struct('QQ')
+
+# The buffers are accessed through typed views, made with memoryview.cast(),
+# which was added in Python 3.3. Python 2.6 has no memoryview at all.
+try:
+    HAS_CAST = hasattr(memoryview, 'cast')
+except NameError:
+    HAS_CAST = False
+
+
+def buffer_size(count):
+    "The number of bytes needed for a buffer holding count values"
+    return HEADER.size + 8 * count
+
+
+class SolutionBuffer(object):
+    """Publishes the values of a fixed list of variables into shared memory.
+
+    Each variable is assigned the slot matching its position in
+    ``variables``. If no buffer is provided, a new
+    ``multiprocessing.shared_memory`` block is created, which other
+    processes can attach to by name.
+
+    Register the buffer with SimplexSolver.add_solution_buffer() to have
+    it updated at the end of every solve.
+    """
+    def __init__(self, variables, name=None, buffer=None):
+        if not HAS_CAST:
+            raise RuntimeError('Solution buffers require Python 3.3')
+        self.variables = list(variables)
+        self.slots = dict((v, i) for i, v in enumerate(self.variables))
+
+        size = buffer_size(len(self.variables))
+        if buffer is None:
+            if shared_memory is None:
+                raise RuntimeError('Shared memory requires Python 3.8; provide a buffer instead')
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            buffer = self.shm.buf
+        else:
+            self.shm = None
+
+        view = memoryview(buffer)
+        self.header = view[:HEADER.size].cast('Q')
+        self.values = view[HEADER.size:size].cast('d')
+        self.header[0] = 0
+        self.header[1] = len(self.variables)
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm else None
+
+    @property
+    def sequence(self):
+        return self.header[0]
+
+    def publish(self):
+        "Write the current value of every variable into its slot"
+        header = self.header
+        values = self.values
+        header[0] = header[0] + 1
+        for i, v in enumerate(self.variables):
+            values[i] = v.value
+        header[0] = header[0] + 1
+
+    def close(self):
+        "Release the buffer; the creator should also call unlink()"
+        self.header.release()
+        self.values.release()
+        if self.shm:
+            self.shm.close()
+
+    def unlink(self):
+        if self.shm:
+            self.shm.unlink()
+
+
+class SolutionBufferReader(object):
+    """Reads solutions published by a SolutionBuffer in another process.
+
+    ``values`` is a view directly onto the shared memory. To read it
+    without copying, note the sequence number with begin(), read the slots
+    that are needed, and then check the read with validate(); if it returns
+    False, the solution was updated while it was being read.
+    """
+    def __init__(self, name=None, buffer=None):
+        if not HAS_CAST:
+            raise RuntimeError('Solution buffers require Python 3.3')
+        if buffer is None:
+            if shared_memory is None:
+                raise RuntimeError('Shared memory requires Python 3.8; provide a buffer instead')
+            self.shm = shared_memory.SharedMemory(name=name)
+            buffer = self.shm.buf
+        else:
+            self.shm = None
+
+        view = memoryview(buffer)
+        self.header = view[:HEADER.size].cast('Q')
+        self.values = view[HEADER.size:buffer_size(self.header[1])].cast('d')
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def sequence(self):
+        return self.header[0]
+
+    def begin(self):
+        "Wait for any update in progress, and return the sequence number"
+        sequence = self.header[0]
+        while sequence % 2:
+            sequence = self.header[0]
+        return sequence
+
+    def validate(self, sequence):
+        "Return True if no update has started since begin() returned sequence"
+        return self.header[0] == sequence
+
+    def read(self):
+        "Return a consistent copy of the sequence number and all values"
+        while True:
+            sequence = self.begin()
+            values = self.values.tolist()
+            if self.validate(sequence):
+                return sequence, values
+
+    def close(self):
+        self.header.release()
+        self.values.release()
+        if self.shm:
+            self.shm.close()
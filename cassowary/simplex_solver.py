@@ -1,10 +1,63 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
+import sys
+import time
+import weakref
+from collections import deque
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # Python 2.6. Only the parts of OrderedDict that the solution cache
+    # uses; the caches are small, so keeping the order in a list is fine.
+    class OrderedDict(dict):
+        def __init__(self):
+            super(OrderedDict, self).__init__()
+            self.order = []
+
+        def __setitem__(self, key, value):
+            if key not in self:
+                self.order.append(key)
+            super(OrderedDict, self).__setitem__(key, value)
+
+        def pop(self, key, *default):
+            if key in self:
+                self.order.remove(key)
+            return super(OrderedDict, self).pop(key, *default)
+
+        def popitem(self, last=True):
+            key = self.order.pop() if last else self.order.pop(0)
+            return key, super(OrderedDict, self).pop(key)
+
+        def clear(self):
+            super(OrderedDict, self).clear()
+            del self.order[:]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .bounds import Bounds
 from .edit_info import EditInfo
 from .error import RequiredFailure, ConstraintNotFound, InternalError
-from .expression import Expression, StayConstraint, EditConstraint, ObjectiveVariable, SlackVariable, DummyVariable
+from .solution import Solution
+from .expression import Expression, Constraint, StayConstraint, EditConstraint, ObjectiveVariable, SlackVariable, DummyVariable
+from .parametric import AffineMap
 from .tableau import Tableau
-from .utils import approx_equal, EPSILON, STRONG, WEAK
+from .utils import approx_equal, EPSILON, REQUIRED, STRONG, WEAK, SymbolicWeight
+
+# The most precise clock available
+clock = getattr(time, 'perf_counter', time.time)
+
+# The counter that numbers each prefix of internal variable.
+NUMBER_COUNTERS = {
+    's': 'slack_counter',
+    'em': 'slack_counter',
+    'ep': 'slack_counter',
+    'd': 'dummy_counter',
+    'a': 'artificial_counter',
+}
 
 
 class SolverEditContext(object):
@@ -19,9 +72,13 @@ class SolverEditContext(object):
 
 
 class SimplexSolver(Tableau):
-    def __init__(self):
+    def __init__(self, symbolic=False):
         super(SimplexSolver, self).__init__()
 
+        # In symbolic mode, the objective is built from SymbolicWeights,
+        # so strengths are compared level by level rather than summed.
+        self.symbolic = symbolic
+
         self.stay_error_vars = []
 
         self.error_vars = {}
@@ -29,15 +86,136 @@ class SimplexSolver(Tableau):
 
         self.objective = ObjectiveVariable('Z')
         self.edit_var_map = {}
+        # Persistent edit variables that aren't part of the current edit
+        # session; map of variable to EditInfo.
+        self.dormant_edit_vars = {}
+        # Map of Parameter to the set of constraints that refer to it.
+        self.parameter_constraints = {}
 
         self.slack_counter = 0
         self.artificial_counter = 0
         self.dummy_counter = 0
+        # Map of counter name to the set of numbers, at or below the
+        # counter, that are free to be given to new internal variables.
+        self.free_numbers = {'slack_counter': set(), 'artificial_counter': set(), 'dummy_counter': set()}
         self.auto_solve = True
+
+        # Internal variables and rows that are no longer part of the
+        # tableau are kept for reuse, rather than being left for the
+        # garbage collector; a map of variable name prefix to list of
+        # variables, and a list of empty rows. At most pool_size of each
+        # are kept; 0 disables pooling.
+        self.pool_size = 64
+        self.variable_pool = {}
+        self.row_pool = []
         self.needs_solving = False
 
         self.optimize_count = 0
 
+        # Drift detection. Every drift_check_interval resolves, the required
+        # constraints are checked against the current variable values; if
+        # the worst residual exceeds drift_tolerance, or the average row
+        # size exceeds max_density, the tableau is rebuilt.
+        self.drift_check_interval = None
+        self.drift_tolerance = 1e-6
+        self.max_density = None
+        self.resolve_count = 0
+        self.rebuild_count = 0
+
+        # Constraints registered with an owner, mapped to a weak reference
+        # to that owner. When an owner is garbage collected, its
+        # constraints are queued in finalized_constraints, and removed
+        # as a batch before the next solve.
+        self.owned_constraints = {}
+        self.finalized_constraints = []
+        # True while rebuild() is adding the constraints back; the queue
+        # isn't drained then, as the tableau is only partly rebuilt.
+        self.rebuilding = False
+
+        # If publish_solutions is enabled, an immutable Solution snapshot
+        # is published at the end of every solve.
+        self.publish_solutions = False
+        self.solution = Solution(0, {})
+
+        # SolutionBuffers that are updated at the end of every solve.
+        self.solution_buffers = []
+
+        # If propagate_bounds is enabled, interval bounds on the variables
+        # are derived from the required constraints. New required
+        # constraints that the bounds prove infeasible are rejected, and
+        # those they prove redundant are accepted, without touching the
+        # tableau. The bounds are rebuilt when needed if bounds is None.
+        self.propagate_bounds = False
+        self.bounds = None
+        # Redundant constraints that were kept out of the tableau, mapped
+        # to the set of constraints that imply them.
+        self.redundant_constraints = {}
+
+        # If deduplicate is enabled, adding a constraint that is equivalent
+        # to one that has already been added returns the existing constraint
+        # as a shared handle, and counts a reference to it. The constraint
+        # is only removed from the tableau when the last reference is.
+        self.deduplicate = False
+        # Map of canonical key to shared constraint
+        self.shared_constraints = {}
+        # Maps of shared constraint to canonical key, and to reference count
+        self.constraint_keys = {}
+        self.reference_counts = {}
+
+        # The constraints that were installed by reconcile(); a map of
+        # structure key to list of (constraint, sign).
+        self.reconciled = {}
+
+        # Incremented whenever a constraint is added, removed or changed.
+        self.constraint_version = 0
+
+        # If solution_cache_size is set, the most recent resolves are kept
+        # in an LRU cache, keyed by the constraint version and the values of
+        # the edit variables. Resolving to a cached set of edit values
+        # restores the tableau from the cache, without pivoting. Copying
+        # the tableau costs about as much as a resolve, so a solution is
+        # only copied the second time its key is seen; the keys that have
+        # been seen once are kept in an LRU list of the same size.
+        self.solution_cache_size = 0
+        self.solution_cache = OrderedDict()
+        self.solution_cache_seen = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # If parametric is enabled, the solution is extracted as an affine
+        # map of the edit constants whenever an edit session begins, and
+        # after every resolve that changes the basis. Resolves that stay
+        # within the range of the map are evaluated from it directly.
+        self.parametric = False
+        self.affine_map = None
+        self.parametric_count = 0
+
+        # Functions that undo the changes made to constants since the
+        # tableau was last feasible. If the dual simplex finds that the
+        # changes make the required constraints conflict, they are undone.
+        self.pending_undo = []
+
+        # The rule used to choose the leaving row in the dual simplex:
+        # 'first' (lowest id), 'most_infeasible' or 'steepest_edge'. If
+        # harris_tolerance is set, the entering variable is chosen with a
+        # Harris ratio test. The number of dual pivots made by each of the
+        # most recent resolves is recorded in dual_pivot_counts.
+        self.dual_rule = 'first'
+        self.harris_tolerance = None
+        self.dual_pivot_counts = deque(maxlen=1000)
+
+        # Budgets for each call to resolve() or solve(): a number of pivots,
+        # and/or a time in seconds. If a budget runs out, the call returns
+        # False, leaving optimal False, and the next call carries on from
+        # the same basis. After degenerate_limit consecutive degenerate
+        # pivots, Bland's rule is used to prevent cycling.
+        self.max_pivots = None
+        self.time_budget = None
+        self.degenerate_limit = 50
+        self.optimal = True
+        self.pivots_left = None
+        self.deadline = None
+
         self.rows[self.objective] = Expression()
         self.edit_variable_stack = [0]
 
@@ -48,7 +226,7 @@ class SimplexSolver(Tableau):
         return super(SimplexSolver, self).__repr__() + '\n' + '\n'.join(parts)
 
 
-    def add_constraint(self, cn, strength=None, weight=None):
+    def add_constraint(self, cn, strength=None, weight=None, owner=None):
         if strength or weight:
             cn = cn.clone()
             if strength:
@@ -56,54 +234,889 @@ class SimplexSolver(Tableau):
             if weight:
                 cn.weight = weight
 
+        if owner is not None:
+            # Raises TypeError if the owner can't be weakly referenced,
+            # before anything has been changed.
+            weakref.ref(owner)
+
+        key = None
+        if self.deduplicate and isinstance(cn, Constraint):
+            key = cn.canonical_key()
+            shared = self.shared_constraints.get(key)
+            if shared in self.marker_vars or shared in self.redundant_constraints:
+                self.reference_counts[shared] = self.reference_counts[shared] + 1
+                if owner is not None:
+                    self.set_owner(shared, owner)
+                return shared
+
+        if self.finalized_constraints and not self.rebuilding:
+            self.remove_finalized_constraints()
+        self.leave_parametric()
+        self.finish_solving()
+
+        trail = None
+        if self.propagate_bounds and Bounds.is_eligible(cn):
+            trail = self.add_to_bounds(cn)
+            if trail is None:
+                self.constraints_changed()
+                if key is not None:
+                    self.share_constraint(cn, key)
+                if owner is not None:
+                    self.set_owner(cn, owner)
+                return cn
+
         # print('add_constraint', cn)
         expr, eplus, eminus, prev_edit_constant = self.new_expression(cn)
 
-        if not self.try_adding_directly(expr):
-            self.add_with_artificial_variable(expr)
+        try:
+            if not self.try_adding_directly(expr):
+                self.add_with_artificial_variable(expr)
+        except RequiredFailure as e:
+            if trail is not None:
+                self.bounds.undo(trail)
+            self.recycle_variable(self.marker_vars.pop(cn))
+            for v in cn.expression.terms:
+                if v.is_parameter:
+                    constraints = self.parameter_constraints[v]
+                    constraints.discard(cn)
+                    if not constraints:
+                        del self.parameter_constraints[v]
+            # Looking for a feasible basis may have left it short of optimal.
+            self.optimize(self.objective)
+            # The new constraint is always part of the conflict.
+            e.constraints = [cn] + [c for c in e.constraints if c is not cn]
+            raise
 
         self.needs_solving = True
+        self.constraints_changed()
+        if key is not None:
+            self.share_constraint(cn, key)
 
         if cn.is_edit_constraint:
             i = len(self.edit_var_map)
 
             self.edit_var_map[cn.variable] = EditInfo(cn, eplus, eminus, prev_edit_constant, i)
 
+        if owner is not None:
+            self.set_owner(cn, owner)
+
         if self.auto_solve:
             self.optimize(self.objective)
             self.set_external_variables()
 
         return cn
 
-    def add_edit_var(self, v, strength=STRONG):
+    def set_owner(self, cn, owner):
+        """Tie the lifetime of a constraint to the lifetime of an owner object.
+
+        The solver only holds a weak reference to the owner. Once the owner
+        has been garbage collected, the constraint is removed as part of
+        the next solve. Each reference to a shared constraint can have an
+        owner of its own; the owner releases that reference.
+        """
+        if cn not in self.marker_vars and cn not in self.redundant_constraints:
+            raise ConstraintNotFound()
+
+        # The callback must not refer to the solver, or the solver would be
+        # kept alive by its owners.
+        finalized = self.finalized_constraints
+        ref = weakref.ref(owner, lambda ref: finalized.append(cn))
+        if self.reference_counts.get(cn, 1) > 1:
+            self.owned_constraints.setdefault(cn, []).append(ref)
+        else:
+            self.owned_constraints[cn] = [ref]
+
+    def check_unshared(self, cn):
+        """Raise InternalError if cn is shared by more than one reference.
+
+        A change to a shared constraint would change it for every holder,
+        and equivalent constraints may have been written differently (for
+        example, 2x == 20 shares x == 10), so it can't be changed in place.
+        """
+        if self.reference_counts.get(cn, 1) > 1:
+            raise InternalError(
+                "Can't change a constraint with %s references; remove it, and add the new constraint"
+                % self.reference_counts[cn]
+            )
+
+    def share_constraint(self, cn, key):
+        "Register cn as the shared constraint for a canonical key"
+        self.shared_constraints[key] = cn
+        self.constraint_keys[cn] = key
+        self.reference_counts.setdefault(cn, 1)
+
+    def unshare_constraint(self, cn):
+        key = self.constraint_keys.pop(cn)
+        del self.reference_counts[cn]
+        if self.shared_constraints.get(key) is cn:
+            del self.shared_constraints[key]
+
+    def rekey_constraint(self, cn):
+        "Update the canonical key of a shared constraint that has been changed"
+        key = self.constraint_keys.get(cn)
+        if key is not None:
+            if self.shared_constraints.get(key) is cn:
+                del self.shared_constraints[key]
+            self.share_constraint(cn, cn.canonical_key())
+
+    def references(self, cn):
+        "The number of references to a constraint that has been added"
+        if cn not in self.marker_vars and cn not in self.redundant_constraints:
+            raise ConstraintNotFound()
+        return self.reference_counts.get(cn, 1)
+
+    def reconcile(self, constraints):
+        """Make the constraints installed by reconcile() match a desired set.
+
+        The desired constraints are matched against those installed by the
+        previous call, by structure (terms and operator). Matching
+        constraints are kept; where only the constant, strength or weight
+        differs, the installed constraint is updated in place. Everything
+        else is removed or added, and the system is solved once at the end.
+        Constraints that were added in any other way aren't affected; if
+        deduplicate is enabled, and one of them is shared with a desired
+        constraint, only the reference held by reconcile() is released.
+
+        Stays are matched by their variable alone, as their constants follow
+        the values of their variables. Edit constraints can't be reconciled;
+        use add_edit_var() for those.
+
+        Returns the installed constraint for each of the desired
+        constraints, in order.
+        """
+        for cn in constraints:
+            if cn.is_edit_constraint:
+                raise InternalError("Edit constraints can't be reconciled; use add_edit_var()")
+
+        desired = {}
+        for cn in constraints:
+            key, sign = cn.structure_key()
+            desired.setdefault(key, []).append((cn, sign))
+
+        installed = self.reconciled
+        removals = []
+        updates = []
+        additions = []
+        handles = {}
+        reconciled = {}
+        for key, wanted in desired.items():
+            # Constraints that were removed explicitly don't count.
+            current = [
+                (cn, sign)
+                for cn, sign in installed.get(key, ())
+                if cn in self.marker_vars or cn in self.redundant_constraints
+            ]
+            kept = reconciled[key] = []
+            unmatched = []
+            for cn, sign in wanted:
+                for i, (old, old_sign) in enumerate(current):
+                    if ((cn.is_stay_constraint or old.expression.constant * old_sign == cn.expression.constant * sign)
+                            and self.same_strength(old, cn)):
+                        handles[cn] = old
+                        kept.append(current.pop(i))
+                        break
+                else:
+                    unmatched.append((cn, sign))
+
+            for (cn, sign), (old, old_sign) in zip(unmatched, current):
+                # A strength can't be changed to or from REQUIRED in place,
+                # and a shared constraint can't be changed at all; its
+                # other holders keep it as it is.
+                if old.is_required == cn.is_required and self.reference_counts.get(old, 1) == 1:
+                    updates.append((old, old_sign, cn, sign))
+                    handles[cn] = old
+                    kept.append((old, old_sign))
+                else:
+                    removals.append(old)
+                    additions.append((key, cn, sign))
+            removals.extend(old for old, old_sign in current[len(unmatched):])
+            additions.extend((key, cn, sign) for cn, sign in unmatched[len(current):])
+
+        for key, current in installed.items():
+            if key not in desired:
+                removals.extend(
+                    cn for cn, sign in current
+                    if cn in self.marker_vars or cn in self.redundant_constraints
+                )
+
+        self.reconciled = reconciled
+        if removals or updates or additions:
+            auto_solve = self.auto_solve
+            self.auto_solve = False
+            try:
+                for cn in removals:
+                    self.remove_constraint(cn)
+                for old, old_sign, cn, sign in updates:
+                    constant = cn.expression.constant * sign * old_sign
+                    if not old.is_stay_constraint and old.expression.constant != constant:
+                        self.update_constant(old, constant)
+                    if not old.is_required and not self.same_strength(old, cn):
+                        self.change_strength(old, cn.strength, cn.weight)
+                for key, cn, sign in additions:
+                    handle = self.add_constraint(cn)
+                    handles[cn] = handle
+                    if handle is not cn:
+                        # An equivalent constraint was already installed;
+                        # it may have been written differently.
+                        key, sign = handle.structure_key()
+                    reconciled.setdefault(key, []).append((handle, sign))
+            finally:
+                self.auto_solve = auto_solve
+
+            # The additions leave the tableau short of optimal, and the
+            # updates may leave it infeasible.
+            self.optimal = False
+            if self.auto_solve:
+                self.resolve()
+
+        return [handles[cn] for cn in constraints]
+
+    def same_strength(self, cn, other):
+        "Do two constraints have the same strength and weight?"
+        return (
+            SymbolicWeight.from_strength(cn.strength).levels == SymbolicWeight.from_strength(other.strength).levels
+            and cn.weight == other.weight
+        )
+
+    def remove_finalized_constraints(self):
+        """Remove all constraints whose owners have been garbage collected.
+
+        The removals are performed without reoptimizing; the caller is
+        responsible for solving the system afterwards.
+        """
+        auto_solve = self.auto_solve
+        self.auto_solve = False
+        try:
+            while self.finalized_constraints:
+                cn = self.finalized_constraints.pop()
+                if cn in self.owned_constraints:
+                    self.remove_constraint(cn)
+        finally:
+            self.auto_solve = auto_solve
+
+    def add_edit_var(self, v, strength=None, persistent=False):
+        """Mark a variable as an edit variable.
+
+        A persistent edit variable isn't removed at the end of an edit
+        session; it remains registered with the solver, but dormant (with
+        no influence on the solution), until it is added again. This avoids
+        the cost of adding and removing the edit constraint for every
+        session. A new edit constraint is STRONG unless another strength is
+        given; a reactivated one keeps its strength unless another is given.
+        """
         # print("add_edit_var", v, strength)
-        return self.add_constraint(EditConstraint(v, strength))
+        cei = self.dormant_edit_vars.get(v)
+        if cei is not None:
+            return self.reactivate_edit_var(v, strength)
+
+        if strength is None:
+            strength = STRONG
+        if persistent and strength == REQUIRED:
+            raise InternalError("Required edit variables can't be persistent")
+
+        cn = self.add_constraint(EditConstraint(v, strength))
+        self.edit_var_map[v].persistent = persistent
+        return cn
 
     def remove_edit_var(self, v):
-        self.remove_constraint(self.edit_var_map[v].constraint)
+        cei = self.edit_var_map.get(v)
+        if cei is None:
+            cei = self.dormant_edit_vars[v]
+        self.remove_constraint(cei.constraint)
+
+    def add_to_objective(self, cn, coefficient):
+        "Add the error variables of a constraint to the objective, scaled by coefficient"
+        z_row = self.rows[self.objective]
+        for cv in self.error_vars.get(cn, ()):
+            expr = self.rows.get(cv)
+            if expr is None:
+                z_row.add_variable(cv, coefficient, self.objective, self)
+            else:
+                z_row.add_expression(expr, coefficient, self.objective, self)
+
+    def change_strength(self, cn, strength=None, weight=None):
+        """Change the strength and/or weight of a non-required constraint in place.
+
+        Only the constraint's terms in the objective change, so the current
+        basis remains feasible, and the solver reoptimizes from it.
+        """
+        self.leave_parametric()
+        self.finish_solving()
+        if cn not in self.marker_vars and cn not in self.redundant_constraints:
+            raise ConstraintNotFound()
+        if cn.is_required or strength == REQUIRED:
+            raise InternalError("Can't change the strength of a required constraint")
+        self.check_unshared(cn)
+
+        old_coefficient = self.objective_coefficient(cn)
+        if strength is not None:
+            cn.strength = strength
+        if weight is not None:
+            cn.weight = weight
+        self.rekey_constraint(cn)
+
+        # A dormant edit constraint isn't part of the objective until it
+        # is reactivated.
+        if cn.is_edit_constraint and cn.variable in self.dormant_edit_vars:
+            return
+
+        self.add_to_objective(cn, self.objective_coefficient(cn) - old_coefficient)
+        self.needs_solving = True
+        self.constraints_changed()
+
+        if self.auto_solve:
+            self.optimize(self.objective)
+            self.set_external_variables()
+
+    def update_constant(self, cn, constant):
+        """Change the constant of a constraint that has already been added.
+
+        The change is propagated through the constraint's marker variable,
+        without removing and re-adding the constraint, and followed by a
+        single dual resolve.
+        """
+        self.check_unshared(cn)
+        if cn in self.redundant_constraints:
+            # The constraint isn't in the tableau; check it again.
+            reasons = self.redundant_constraints.pop(cn)
+            old_constant = cn.expression.constant
+            cn.expression.constant = constant
+            self.rekey_constraint(cn)
+            try:
+                self.add_constraint(cn)
+            except RequiredFailure:
+                cn.expression.constant = old_constant
+                self.rekey_constraint(cn)
+                self.redundant_constraints[cn] = reasons
+                raise
+            return
+
+        if cn not in self.marker_vars:
+            raise ConstraintNotFound()
+        if cn.is_edit_constraint:
+            raise InternalError("Use suggest_value() to change the value of an edit variable")
+
+        eligible = Bounds.is_eligible(cn)
+        if eligible:
+            # The constraints that cn made redundant are added to the
+            # tableau while cn still has its old constant, which implies
+            # them; if the new constant conflicts, undoing it leaves them
+            # in place.
+            self.remove_from_bounds(cn)
+            self.restore_redundant_constraints(cn)
+
+        mark = len(self.pending_undo)
+        old_constant = cn.expression.constant
+        try:
+            self.shift_constant(cn, constant - old_constant)
+            cn.expression.constant = constant
+            self.rekey_constraint(cn)
+
+            def undo():
+                cn.expression.constant = old_constant
+                self.rekey_constraint(cn)
+            self.pending_undo.insert(mark, undo)
+
+            if self.auto_solve:
+                self.resolve()
+        finally:
+            # Whichever constant cn ended up with, it goes back into the
+            # bounds.
+            if eligible and self.bounds is not None:
+                conflict, trail = self.bounds.add(cn)
+                if conflict is not None:
+                    self.bounds = None
+
+    def set_parameter(self, param, value):
+        """Change the value of a Parameter.
+
+        Every constraint that refers to the parameter is updated, followed
+        by a single dual resolve.
+        """
+        mark = len(self.pending_undo)
+        old_value = param.value
+        delta = value - old_value
+        param.value = float(value)
+
+        def undo():
+            param.value = old_value
+        self.pending_undo.append(undo)
+
+        try:
+            for cn in self.parameter_constraints.get(param, ()):
+                self.shift_constant(cn, cn.expression.terms[param] * delta)
+        except RequiredFailure:
+            self.undo_changes(mark)
+            raise
+
+        if self.auto_solve:
+            self.resolve()
+
+    def shift_constant(self, cn, delta):
+        """Add delta to the constant of a constraint in the tableau.
+
+        This is a generalization of delta_edit_constant. The constraint's
+        marker variable absorbs the change: if the marker is basic, only its
+        own row changes; otherwise every row that refers to the marker is
+        adjusted. Rows that become infeasible are left for dual_optimize.
+        """
+        self.leave_parametric()
+        self.finish_solving()
+        self.apply_shift(cn, delta)
+
+    def apply_shift(self, cn, delta):
+        "The tableau update of shift_constant(), which can be undone"
+        self.needs_solving = True
+        self.constraints_changed()
+        marker = self.marker_vars[cn]
+        # The coefficient of the marker in the constraint's equation.
+        if marker.is_dummy:
+            delta = -delta
+        expr = self.rows.get(marker)
+        if expr is not None:
+            if marker.is_dummy and not approx_equal(expr.constant + delta, 0.0):
+                # The constraint is redundant, and the new constant would
+                # contradict the constraints it depends upon.
+                raise RequiredFailure(constraints=[cn] + self.explain_row(expr))
+            expr.constant = expr.constant + delta
+            if marker.is_restricted and expr.constant < 0.0:
+                self.infeasible_rows.add(marker)
+        else:
+            for basic_var in self.columns.get(marker, ()):
+                expr = self.rows[basic_var]
+                expr.constant = expr.constant - expr.coefficient_for(marker) * delta
+                if basic_var.is_restricted and expr.constant < 0.0:
+                    self.infeasible_rows.add(basic_var)
+                if basic_var.is_stay_error:
+                    self.changed_stay_rows.add(basic_var)
+
+        undo_delta = -delta if marker.is_dummy else delta
+
+        def undo():
+            # The constraint may have been removed since.
+            if cn in self.marker_vars:
+                self.apply_shift(cn, -undo_delta)
+        self.pending_undo.append(undo)
+
+    def undo_changes(self, mark=0):
+        "Undo the changes to constants made since pending_undo had mark entries"
+        undo = self.pending_undo[mark:]
+        for change in reversed(undo):
+            change()
+        # Undoing a shift records a shift of its own.
+        del self.pending_undo[mark:]
+
+    def restore_feasibility(self):
+        """Restore feasibility with the dual simplex method.
+
+        If the changes to constants since the tableau was last feasible
+        make the required constraints conflict, they are undone, and
+        RequiredFailure is raised. Returns the number of pivots.
+        """
+        try:
+            pivots = self.dual_optimize()
+        except RequiredFailure:
+            pivots_left, deadline = self.pivots_left, self.deadline
+            self.end_budget()
+            try:
+                self.undo_changes()
+                # The constants were feasible before they were changed.
+                self.dual_optimize()
+            finally:
+                self.pivots_left, self.deadline = pivots_left, deadline
+            self.set_external_variables()
+            self.reset_stay_constants()
+            raise
+        if not self.infeasible_rows:
+            del self.pending_undo[:]
+        return pivots
+
+    def anchor_edit_var(self, cei, value):
+        "Shift the target of an edit constraint to value"
+        delta = value - cei.prev_edit_constant
+        cei.prev_edit_constant = value
+        self.delta_edit_constant(delta, cei.edit_plus, cei.edit_minus)
+
+    def deactivate_edit_var(self, v):
+        """Make a persistent edit variable dormant.
+
+        The edit constraint is anchored at the current value of the
+        variable, and its error variables are removed from the objective,
+        so it no longer has any influence on the solution.
+        """
+        self.leave_parametric()
+        self.finish_solving()
+        cei = self.edit_var_map.pop(v)
+        self.anchor_edit_var(cei, v.value)
+        self.add_to_objective(cei.constraint, -self.objective_coefficient(cei.constraint))
+        self.dormant_edit_vars[v] = cei
+        self.needs_solving = True
+
+        if self.auto_solve:
+            self.optimize(self.objective)
+            self.set_external_variables()
+
+    def reactivate_edit_var(self, v, strength=None):
+        "Make a dormant edit variable part of the current edit session"
+        self.leave_parametric()
+        self.finish_solving()
+        if strength == REQUIRED:
+            raise InternalError("Required edit variables can't be persistent")
+        cei = self.dormant_edit_vars.pop(v)
+        cn = cei.constraint
+        if strength is not None:
+            cn.strength = strength
+            self.rekey_constraint(cn)
+
+        # The variable may have moved while the edit constraint was dormant.
+        self.anchor_edit_var(cei, v.value)
+        self.add_to_objective(cn, self.objective_coefficient(cn))
+        cei.index = len(self.edit_var_map)
+        self.edit_var_map[v] = cei
+        self.needs_solving = True
+
+        if self.auto_solve:
+            self.optimize(self.objective)
+            self.set_external_variables()
+
+        return cn
 
     def edit(self):
         return SolverEditContext(self)
 
     def resolve(self):
-        self.dual_optimize()
+        """Solve the system again after new values have been suggested.
+
+        Returns True if the solution is optimal. If a budget has been set,
+        and it runs out, returns False; the variables keep the best
+        feasible values that were found, and the next call to resolve()
+        carries on from where this one stopped.
+        """
+        if self.affine_map is not None:
+            if not self.finalized_constraints and self.affine_map.evaluate():
+                self.parametric_count = self.parametric_count + 1
+                self.needs_solving = False
+                self.publish_external_variables()
+                return True
+            self.leave_parametric()
+
+        if self.solution_cache_size and not self.finalized_constraints:
+            key = self.solution_key()
+            entry = self.solution_cache.pop(key, None)
+            if entry is not None:
+                self.solution_cache[key] = entry
+                self.cache_hits = self.cache_hits + 1
+                self.restore_solution(entry)
+                self.resolve_count = self.resolve_count + 1
+                return True
+            self.cache_misses = self.cache_misses + 1
+
+        self.start_budget()
+        try:
+            self.dual_pivot_counts.append(self.restore_feasibility())
+            if self.infeasible_rows:
+                # The budget ran out before the basis was feasible again,
+                # so the variables keep their previous values.
+                self.optimal = False
+                return False
+
+            if self.finalized_constraints:
+                self.remove_finalized_constraints()
+                self.optimal = False
+            if not self.optimal:
+                self.optimal = self.optimize(self.objective)
+        finally:
+            self.end_budget()
+
         self.set_external_variables()
         self.infeasible_rows.clear()
         self.reset_stay_constants()
 
+        self.resolve_count = self.resolve_count + 1
+        if not self.optimal:
+            return False
+
+        if self.drift_check_interval and self.resolve_count % self.drift_check_interval == 0:
+            self.check_drift()
+
+        if self.solution_cache_size:
+            self.cache_solution()
+
+        if self.parametric and self.edit_var_map:
+            self.affine_map = AffineMap(self)
+        return True
+
+    def start_budget(self):
+        "Start the budget for a call to resolve() or solve()"
+        self.pivots_left = self.max_pivots
+        if self.time_budget is not None:
+            self.deadline = clock() + self.time_budget
+
+    def end_budget(self):
+        self.pivots_left = None
+        self.deadline = None
+
+    def spend_budget(self):
+        """Account for a pivot against the budget.
+
+        Returns False if there is no budget left for the pivot.
+        """
+        if self.pivots_left is not None:
+            if self.pivots_left <= 0:
+                return False
+            self.pivots_left = self.pivots_left - 1
+        if self.deadline is not None and clock() >= self.deadline:
+            return False
+        return True
+
+    def finish_solving(self):
+        """Complete a solve that was interrupted by its budget.
+
+        The tableau must be optimal before it can be changed; the budget
+        doesn't apply.
+        """
+        if not self.optimal:
+            pivots_left, deadline = self.pivots_left, self.deadline
+            self.end_budget()
+            try:
+                self.restore_feasibility()
+                self.optimal = self.optimize(self.objective)
+            finally:
+                self.pivots_left, self.deadline = pivots_left, deadline
+
+    def leave_parametric(self):
+        "Bring the tableau up to date, and discard the affine map of the edits"
+        if self.affine_map is not None:
+            affine_map, self.affine_map = self.affine_map, None
+            affine_map.sync(self)
+
+    def constraints_changed(self):
+        "Invalidate everything that depends on the current set of constraints"
+        self.constraint_version = self.constraint_version + 1
+        self.solution_cache.clear()
+        self.solution_cache_seen.clear()
+
+    def solution_key(self):
+        "The key of the current state of the solver in the solution cache"
+        edits = sorted(self.edit_var_map.items(), key=lambda item: item[1].index)
+        return (self.constraint_version, tuple((v, cei.prev_edit_constant) for v, cei in edits))
+
+    def cache_solution(self):
+        """Add the current solution to the solution cache.
+
+        The entry holds a copy of the tableau, from which the values of the
+        external variables can be read again, and solving can continue.
+        Dormant edit variables are anchored within the tableau, so their
+        anchors are stored as well. The first time a key is seen, it is
+        only noted; the copy is made if it is seen again.
+        """
+        key = self.solution_key()
+        if self.solution_cache_seen.pop(key, None) is None:
+            self.solution_cache_seen[key] = True
+            while len(self.solution_cache_seen) > self.solution_cache_size:
+                self.solution_cache_seen.popitem(last=False)
+            return
+
+        anchors = [(cei, cei.prev_edit_constant) for cei in self.dormant_edit_vars.values()]
+        self.solution_cache[key] = (self.snapshot(), anchors)
+        while len(self.solution_cache) > self.solution_cache_size:
+            self.solution_cache.popitem(last=False)
+
+    def restore_solution(self, entry):
+        "Restore the tableau from an entry of the solution cache"
+        snapshot, anchors = entry
+        self.restore(snapshot)
+        for cei, anchor in anchors:
+            cei.prev_edit_constant = anchor
+        self.optimal = True
+        self.set_external_variables()
+
+    def measure_drift(self):
+        """Return the largest violation of any required constraint.
+
+        The residual is computed from the current values of the external
+        variables, so it measures how far floating point drift in the
+        tableau has carried the solution away from the original constraints.
+        """
+        drift = 0.0
+        for cn in self.marker_vars:
+            if not cn.is_required:
+                continue
+            residual = cn.expression.constant
+            for v, c in cn.expression.terms.items():
+                residual = residual + c * v.value
+            if cn.is_inequality:
+                residual = min(residual, 0.0)
+            drift = max(drift, abs(residual))
+        return drift
+
+    def check_drift(self):
+        """Rebuild the tableau if drift or density has passed its threshold.
+
+        Returns True if the tableau was rebuilt.
+        """
+        if self.measure_drift() > self.drift_tolerance or (
+                self.max_density is not None and self.density() > self.max_density):
+            self.rebuild()
+            return True
+        return False
+
+    def rebuild(self):
+        """Rebuild the tableau from the original constraints.
+
+        Stays are re-anchored at the current values of their variables, and
+        edit constraints keep their most recently suggested value, so any
+        edit session in progress carries on as if nothing had happened.
+        """
+        if self.finalized_constraints:
+            self.remove_finalized_constraints()
+        self.leave_parametric()
+        self.finish_solving()
+        constraints = [cn for cn in self.marker_vars if not cn.is_edit_constraint]
+        edits = sorted(self.edit_var_map.values(), key=lambda cei: cei.index)
+        dormant = list(self.dormant_edit_vars.values())
+
+        self.columns.clear()
+        self.rows.clear()
+        self.infeasible_rows.clear()
+        self.external_rows.clear()
+        self.external_parametric_vars.clear()
+        self.changed_stay_rows.clear()
+        self.stay_error_vars = []
+        self.error_vars = {}
+        self.marker_vars = {}
+        self.edit_var_map = {}
+        self.dormant_edit_vars = {}
+        self.parameter_constraints = {}
+        self.bounds = None
+        self.pending_undo = []
+        self.constraints_changed()
+        self.reset_numbering()
+        self.variable_pool = {}
+        self.row_pool = []
+        self.rows[self.objective] = Expression()
+
+        auto_solve = self.auto_solve
+        self.auto_solve = False
+        self.rebuilding = True
+        try:
+            for cn in constraints:
+                if cn.is_stay_constraint:
+                    cn.expression.constant = cn.variable.value
+                self.add_constraint(cn)
+
+            for cei in edits:
+                cei.constraint.expression.constant = cei.prev_edit_constant
+                self.add_constraint(cei.constraint)
+                self.edit_var_map[cei.constraint.variable].persistent = cei.persistent
+
+            for cei in dormant:
+                v = cei.constraint.variable
+                cei.constraint.expression.constant = v.value
+                self.add_constraint(cei.constraint)
+                self.edit_var_map[v].persistent = True
+                self.deactivate_edit_var(v)
+        finally:
+            self.auto_solve = auto_solve
+            self.rebuilding = False
+
+        self.rebuild_count = self.rebuild_count + 1
+        self.optimize(self.objective)
+        self.set_external_variables()
+
+    def minimal_conflict(self, constraints):
+        """Reduce a set of conflicting required constraints to a minimal one.
+
+        The constraints reported by a RequiredFailure are enough to cause
+        the failure, but they may not all be needed. This bisects the set,
+        adding subsets of the constraints to scratch solvers, and returns a
+        subset from which no constraint can be removed without resolving the
+        conflict. If the constraints don't conflict, an empty list is
+        returned.
+
+        The constraints are checked as they are currently defined; the
+        solver itself, and the values of the variables, aren't changed.
+        """
+        def consistent(constraints):
+            solver = SimplexSolver()
+            solver.auto_solve = False
+            try:
+                for cn in constraints:
+                    solver.add_constraint(cn)
+            except RequiredFailure:
+                return False
+            return True
+
+        def conflict(background, check, candidates):
+            # QuickXplain: find the constraints of candidates that conflict
+            # with background.
+            if check and not consistent(background):
+                return []
+            if len(candidates) == 1:
+                return candidates
+            half = len(candidates) // 2
+            first, second = candidates[:half], candidates[half:]
+            second = conflict(background + first, True, second)
+            first = conflict(background + second, bool(second), first)
+            return first + second
+
+        constraints = list(constraints)
+        if consistent(constraints):
+            return []
+        return conflict([], False, constraints)
+
+    def memory_report(self):
+        """Describe the memory used by the solver.
+
+        Extends the tableau report with the solver's per-constraint
+        bookkeeping. Once every constraint has been removed, the report
+        returns to the same values as a newly constructed solver.
+        """
+        report = super(SimplexSolver, self).memory_report()
+
+        size = sys.getsizeof(self.error_vars) + sys.getsizeof(self.marker_vars)
+        size = size + sys.getsizeof(self.stay_error_vars) + sys.getsizeof(self.edit_var_map)
+        error_entries = 0
+        for e_vars in self.error_vars.values():
+            size = size + sys.getsizeof(e_vars)
+            error_entries = error_entries + len(e_vars)
+
+        report.update({
+            'constraints': len(self.marker_vars),
+            'error_vars': error_entries,
+            'marker_vars': len(self.marker_vars),
+            'stay_error_vars': len(self.stay_error_vars),
+            'edit_vars': len(self.edit_var_map),
+            'dormant_edit_vars': len(self.dormant_edit_vars),
+            'owned_constraints': len(self.owned_constraints),
+            'redundant_constraints': len(self.redundant_constraints),
+            'bytes': report['bytes'] + size,
+        })
+        return report
+
     #######################################################################
     # Internals
     #######################################################################
 
+    def objective_coefficient(self, cn):
+        "The coefficient of a constraint's error variables in the objective"
+        if self.symbolic:
+            return SymbolicWeight.from_strength(cn.strength) * cn.weight
+        return float(cn.strength) * cn.weight
+
     def new_expression(self, cn):
         # print("* new_expression", cn)
         # print("cn.is_inequality == ", cn.is_inequality)
         # print("cn.is_required == ", cn.is_required)
-        expr = Expression(constant=cn.expression.constant)
+        expr = self.new_row(cn.expression.constant)
         eplus = None
         eminus = None
         prev_edit_constant = None
         for v, c in cn.expression.terms.items():
+            if v.is_parameter:
+                expr.constant = expr.constant + c * v.value
+                self.parameter_constraints.setdefault(v, set()).add(cn)
+                continue
             e = self.rows.get(v)
             if not e:
                 expr.add_variable(v, c)
@@ -112,42 +1125,38 @@ class SimplexSolver(Tableau):
 
         if cn.is_inequality:
             # print("Inequality, adding slack")
-            self.slack_counter = self.slack_counter + 1
-            slack_var = SlackVariable(prefix='s', number=self.slack_counter)
+            slack_var = self.reuse_variable('s') or SlackVariable(prefix='s', number=self.take_number('slack_counter'))
             expr.set_variable(slack_var, -1)
 
             self.marker_vars[cn] = slack_var
             if not cn.is_required:
-                self.slack_counter = self.slack_counter + 1
-                eminus = SlackVariable(prefix='em', number=self.slack_counter)
+                eminus = self.reuse_variable('em') or SlackVariable(prefix='em', number=self.take_number('slack_counter'))
                 expr.set_variable(eminus, 1)
                 z_row = self.rows[self.objective]
-                z_row.set_variable(eminus, cn.strength * cn.weight)
+                z_row.set_variable(eminus, self.objective_coefficient(cn))
                 self.insert_error_var(cn, eminus)
                 self.note_added_variable(eminus, self.objective)
         else:
             if cn.is_required:
                 # print("Equality, required")
-                self.dummy_counter = self.dummy_counter + 1
-                dummy_var = DummyVariable(number=self.dummy_counter)
+                dummy_var = self.reuse_variable('d') or DummyVariable(number=self.take_number('dummy_counter'))
                 eplus = dummy_var
                 eminus = dummy_var
                 prev_edit_constant = cn.expression.constant
                 expr.set_variable(dummy_var, 1)
                 self.marker_vars[cn] = dummy_var
-                # print("Adding dummy_var == d%s" % self.dummy_counter)
+                # print("Adding dummy_var", dummy_var)
             else:
                 # print("Equality, not required")
-                self.slack_counter = self.slack_counter + 1
-                eplus = SlackVariable(prefix='ep', number=self.slack_counter)
-                eminus = SlackVariable(prefix='em', number=self.slack_counter)
+                eplus = self.reuse_variable('ep') or SlackVariable(prefix='ep', number=self.take_number('slack_counter'))
+                eminus = self.reuse_variable('em') or SlackVariable(prefix='em', number=self.take_number('slack_counter'))
                 expr.set_variable(eplus, -1)
                 expr.set_variable(eminus, 1)
                 self.marker_vars[cn] = eplus
 
                 z_row = self.rows[self.objective]
                 # print("z_row", z_row)
-                sw_coeff = cn.strength * cn.weight
+                sw_coeff = self.objective_coefficient(cn)
                 # if sw_coeff == 0:
                 #     print("cn ==", cn)
                 #     print("adding ", eplus, "and", eminus, "with sw_coeff", sw_coeff)
@@ -160,6 +1169,8 @@ class SimplexSolver(Tableau):
                 self.insert_error_var(cn, eplus)
 
                 if cn.is_stay_constraint:
+                    eplus.is_stay_error = True
+                    eminus.is_stay_error = True
                     self.stay_error_vars.append((eplus, eminus))
                 elif cn.is_edit_constraint:
                     prev_edit_constant = cn.expression.constant
@@ -171,9 +1182,13 @@ class SimplexSolver(Tableau):
 
     def begin_edit(self):
         assert len(self.edit_var_map) > 0
+        self.leave_parametric()
+        self.finish_solving()
         self.infeasible_rows.clear()
         self.reset_stay_constants()
         self.edit_variable_stack.append(len(self.edit_var_map))
+        if self.parametric:
+            self.affine_map = AffineMap(self)
 
     def end_edit(self):
         assert len(self.edit_var_map) > 0
@@ -183,6 +1198,8 @@ class SimplexSolver(Tableau):
 
     def remove_all_edit_vars(self):
         self.remove_edit_vars_to(0)
+        for v in list(self.dormant_edit_vars):
+            self.remove_edit_var(v)
 
     def remove_edit_vars_to(self, n):
         try:
@@ -192,42 +1209,140 @@ class SimplexSolver(Tableau):
                     removals.append(v)
 
             for v in removals:
-                self.remove_edit_var(v)
+                if self.edit_var_map[v].persistent:
+                    self.deactivate_edit_var(v)
+                else:
+                    self.remove_edit_var(v)
 
             assert len(self.edit_var_map) == n
 
         except ConstraintNotFound:
             raise InternalError('Constraint not found during internal removal')
 
-    def add_stay(self, v, strength=WEAK, weight=1.0):
-        return self.add_constraint(StayConstraint(v, strength, weight))
+    def add_stay(self, v, strength=WEAK, weight=1.0, owner=None):
+        return self.add_constraint(StayConstraint(v, strength, weight), owner=owner)
 
     def remove_constraint(self, cn):
         # print("removeConstraint", cn)
         # print(self)
+        if self.deduplicate and isinstance(cn, Constraint):
+            if cn not in self.marker_vars and cn not in self.redundant_constraints:
+                # Release a reference to the equivalent shared constraint.
+                cn = self.shared_constraints.get(cn.canonical_key(), cn)
+        count = self.reference_counts.get(cn)
+        if count is not None:
+            if count > 1:
+                self.reference_counts[cn] = count - 1
+                return
+            self.unshare_constraint(cn)
+
+        self.leave_parametric()
+        self.finish_solving()
+        if cn in self.redundant_constraints:
+            del self.redundant_constraints[cn]
+            self.owned_constraints.pop(cn, None)
+            self.constraints_changed()
+            return
+
         self.needs_solving = True
+        self.constraints_changed()
         self.reset_stay_constants()
-        z_row = self.rows[self.objective]
+        self.owned_constraints.pop(cn, None)
 
         e_vars = self.error_vars.get(cn)
         # print("e_vars ==", e_vars)
-        if e_vars:
-            for cv in e_vars:
-                try:
-                    z_row.add_expression(self.rows[cv], -cn.weight * cn.strength, self.objective, self)
-                    # print('add expression', self.rows[cv])
-                except KeyError:
-                    z_row.add_variable(cv, -cn.weight * cn.strength, self.objective, self)
-                    # print('add variable', cv)
+        # A dormant edit constraint has already left the objective.
+        if e_vars and not (cn.is_edit_constraint and cn.variable in self.dormant_edit_vars):
+            self.add_to_objective(cn, -self.objective_coefficient(cn))
 
         try:
             marker = self.marker_vars.pop(cn)
         except KeyError:
             raise ConstraintNotFound()
+        # The internal variables that can be recycled once the constraint
+        # has been removed.
+        released = set(e_vars or ())
+        released.add(marker)
 
+        self.remove_marker(marker)
+
+        if e_vars:
+            # print('e_vars exist')
+            for v in e_vars:
+                if v != marker:
+                    # print('remove column',v)
+                    self.remove_column(v)
+
+        if cn.is_stay_constraint:
+            if e_vars:
+                # for p_evar, m_evar in self.stay_error_vars:
+                remaining = []
+                while self.stay_error_vars:
+                    p_evar, m_evar = self.stay_error_vars.pop()
+                    found = False
+                    try:
+                        # print('stay constraint - remove plus evar', p_evar)
+                        e_vars.remove(p_evar)
+                        found = True
+                    except KeyError:
+                        pass
+                    try:
+                        # print('stay constraint - remove minus evar', m_evar)
+                        e_vars.remove(m_evar)
+                        found = True
+                    except KeyError:
+                        pass
+                    if not found:
+                        remaining.append((p_evar, m_evar))
+                    else:
+                        self.changed_stay_rows.discard(p_evar)
+                        self.changed_stay_rows.discard(m_evar)
+                self.stay_error_vars = remaining
+
+        elif cn.is_edit_constraint:
+            assert e_vars is not None
+            cei = self.edit_var_map.pop(cn.variable, None)
+            if cei is None:
+                cei = self.dormant_edit_vars.pop(cn.variable)
+            # print('edit constraint - remove column', cei.edit_minus)
+            self.remove_column(cei.edit_minus)
+
+        if e_vars is not None:
+            del self.error_vars[cn]
+
+        for v in cn.expression.terms:
+            if v.is_parameter:
+                constraints = self.parameter_constraints[v]
+                constraints.discard(cn)
+                if not constraints:
+                    del self.parameter_constraints[v]
+
+        for v in sorted(released, key=lambda v: v.id):
+            self.recycle_variable(v)
+
+        if not self.marker_vars:
+            # Nothing references the internal variables any more, so their
+            # numbering can start again.
+            self.reset_numbering()
+
+        if self.auto_solve:
+            # print('final auto solve')
+            self.optimize(self.objective)
+            self.set_external_variables()
+
+        if Bounds.is_eligible(cn):
+            self.remove_from_bounds(cn)
+            self.restore_redundant_constraints(cn)
+
+    def remove_marker(self, marker):
+        """Take the row of a marker variable out of the tableau.
+
+        If the marker isn't basic, it is pivoted into the basis first,
+        keeping the tableau feasible.
+        """
         # print("Looking to remove var", marker)
         if not self.rows.get(marker):
-            col = self.columns[marker]
+            col = self.columns.get(marker, set())
             # print("Must pivot -- columns are", col)
             exit_var = None
             min_ratio = 0.0
@@ -240,7 +1355,7 @@ class SimplexSolver(Tableau):
                     # print("Marker", marker, "'s coefficient in", expr, "is", coeff)
                     if coeff < 0:
                         r = -expr.constant / coeff
-                        if exit_var is None or r < min_ratio: # EXTRA BITS IN JS?
+                        if exit_var is None or r < min_ratio or (r == min_ratio and v.id < exit_var.id): # EXTRA BITS IN JS?
                             # print('set exit var = ',v,r)
                             min_ratio = r
                             exit_var = v
@@ -255,7 +1370,7 @@ class SimplexSolver(Tableau):
                         coeff = expr.coefficient_for(marker)
                         # print("Marker", marker, "'s coefficient in", expr, "is", coeff)
                         r = expr.constant / coeff
-                        if exit_var is None or r < min_ratio:
+                        if exit_var is None or r < min_ratio or (r == min_ratio and v.id < exit_var.id):
                             # print('set exit var = ',v,r)
                             min_ratio = r
                             exit_var = v
@@ -266,7 +1381,7 @@ class SimplexSolver(Tableau):
                     # print('remove column',marker)
                     self.remove_column(marker)
                 else:
-                    exit_var = [v for v in col if v != self.objective][-1] # ??
+                    exit_var = max((v for v in col if v != self.objective), key=lambda v: v.id) # ??
                     # print('set exit var', exit_var)
 
             if exit_var is not None:
@@ -275,53 +1390,7 @@ class SimplexSolver(Tableau):
 
         if self.rows.get(marker):
             # print('remove row', marker)
-            expr = self.remove_row(marker)
-
-        if e_vars:
-            # print('e_vars exist')
-            for v in e_vars:
-                if v != marker:
-                    # print('remove column',v)
-                    self.remove_column(v)
-
-        if cn.is_stay_constraint:
-            if e_vars:
-                # for p_evar, m_evar in self.stay_error_vars:
-                remaining = []
-                while self.stay_error_vars:
-                    p_evar, m_evar = self.stay_error_vars.pop()
-                    found = False
-                    try:
-                        # print('stay constraint - remove plus evar', p_evar)
-                        e_vars.remove(p_evar)
-                        found = True
-                    except KeyError:
-                        pass
-                    try:
-                        # print('stay constraint - remove minus evar', m_evar)
-                        e_vars.remove(m_evar)
-                        found = True
-                    except KeyError:
-                        pass
-                    if not found:
-                        remaining.append((p_evar, m_evar))
-                self.stay_error_vars = remaining
-
-        elif cn.is_edit_constraint:
-            assert e_vars is not None
-            # print('edit constraint - remove column', self.edit_var_map[cn.variable].edit_minus)
-            self.remove_column(self.edit_var_map[cn.variable].edit_minus)
-            del self.edit_var_map[cn.variable]
-
-        if e_vars:
-            for e_var in e_vars:
-                # print('Remove error var', e_var)
-                del self.error_vars[e_var]
-
-        if self.auto_solve:
-            # print('final auto solve')
-            self.optimize(self.objective)
-            self.set_external_variables()
+            self.recycle_row(self.remove_row(marker))
 
     def resolve_array(self, new_edit_constants):
         for v, cei in self.edit_var_map.items():
@@ -336,24 +1405,143 @@ class SimplexSolver(Tableau):
         # print(cei)
         delta = x - cei.prev_edit_constant
         cei.prev_edit_constant = x
-        self.delta_edit_constant(delta, cei.edit_plus, cei.edit_minus)
+        if self.affine_map is None:
+            self.delta_edit_constant(delta, cei.edit_plus, cei.edit_minus)
 
     def solve(self):
-        if self.needs_solving:
-            self.optimize(self.objective)
+        """Optimize the system.
+
+        Returns True if the solution is optimal, or False if the budget ran
+        out first; see resolve().
+        """
+        self.leave_parametric()
+        if self.finalized_constraints:
+            self.remove_finalized_constraints()
+        if self.needs_solving or not self.optimal:
+            self.start_budget()
+            try:
+                if not self.optimal:
+                    self.restore_feasibility()
+                    if self.infeasible_rows:
+                        return False
+                self.optimal = self.optimize(self.objective)
+            finally:
+                self.end_budget()
             self.set_external_variables()
+        return self.optimal
 
     def set_edited_value(self, v, n):
-        if v not in self.columns or v not in self.rows:
-            v.value = n
+        self.set_edited_values({v: n})
+
+    def set_edited_values(self, values):
+        """Set the values of several variables, as if each had been edited.
+
+        values is a mapping of variable to new value. All the edits are
+        registered together, suggested together, and resolved once; the
+        edit constraints are then removed as a batch. Variables that are
+        already edit variables are suggested directly, and stay registered.
+        """
+        edits = []
+        for v, n in values.items():
+            if v not in self.columns and v not in self.rows:
+                # The variable isn't part of the system.
+                v.value = n
+            elif not approx_equal(n, v.value):
+                edits.append((v, n))
+
+        if not edits:
+            return
+
+        # The edit variables added here are the ones with an index of at
+        # least n; only those are removed afterwards.
+        n = len(self.edit_var_map)
+        auto_solve = self.auto_solve
+        self.auto_solve = False
+        try:
+            for v, value in edits:
+                if v not in self.edit_var_map:
+                    self.add_edit_var(v)
+            self.optimize(self.objective)
+            self.reset_stay_constants()
 
-        if not approx_equal(n, v.value):
-            self.add_edit_var(v)
-            self.begin_edit()
+            for v, value in edits:
+                self.suggest_value(v, value)
+            self.resolve()
+            self.remove_edit_vars_to(n)
+        finally:
+            self.auto_solve = auto_solve
 
-            self.suggest_value(v, n)
+        self.optimize(self.objective)
+        self.set_external_variables()
 
-            self.end_edit()
+    def sweep(self, var, values, variables=None):
+        """Solve the system for each of a sequence of values of var.
+
+        Returns a numpy array with a row for each value, and a column for
+        each of variables (by default, every external variable, sorted by
+        name). The results are the same as suggesting each value in
+        ascending order, and resolving after each suggestion.
+
+        The values are walked in ascending order. The solver pivots only
+        where the basis changes; between those breakpoints, every variable
+        is an affine function of var, and the results are computed in bulk.
+        At the end of the sweep, var is returned to its original value.
+        """
+        if numpy is None:
+            raise RuntimeError('sweep() requires numpy')
+        if variables is None:
+            variables = sorted(self.external_rows | self.external_parametric_vars, key=lambda v: v.name)
+
+        values = numpy.asarray(values, dtype=float)
+        results = numpy.empty((len(values), len(variables)))
+        if not len(values):
+            return results
+        order = numpy.argsort(values, kind='mergesort')
+        ordered = values[order]
+
+        original = var.value
+        # If var isn't an edit variable already, it is added with an index
+        # of n, and only it is removed at the end of the sweep.
+        n = len(self.edit_var_map)
+        if var not in self.edit_var_map:
+            self.add_edit_var(var)
+        self.leave_parametric()
+        self.finish_solving()
+        self.reset_stay_constants()
+        cei = self.edit_var_map[var]
+
+        start = 0
+        while start < len(order):
+            # Solve for the first value of the run ...
+            self.suggest_value(var, float(ordered[start]))
+            while not self.resolve():
+                # A budget only delays the sweep.
+                pass
+            if self.affine_map is None:
+                self.affine_map = AffineMap(self)
+            affine_map = self.affine_map
+            i = affine_map.edits.index(cei)
+            current = affine_map.current[i]
+
+            # ... and evaluate every value up to the next breakpoint.
+            end = max(start + 1, numpy.searchsorted(ordered, affine_map.limit(i), side='right'))
+            rates = affine_map.rates(i)
+            origin = numpy.array([v.value for v in variables])
+            slope = numpy.array([rates.get(v, 0.0) for v in variables])
+            run = order[start:end]
+            results[run] = origin + numpy.outer(values[run] - current, slope)
+
+            # Leave the map as if each of the values had been resolved.
+            cei.prev_edit_constant = float(ordered[end - 1])
+            affine_map.current[i] = cei.prev_edit_constant
+            start = end
+
+        self.suggest_value(var, original)
+        self.resolve()
+        self.remove_edit_vars_to(n)
+        if not self.parametric:
+            self.leave_parametric()
+        return results
 
     def add_var(self, v):
         if v not in self.columns or v not in self.rows:
@@ -361,10 +1549,10 @@ class SimplexSolver(Tableau):
 
     def add_with_artificial_variable(self, expr):
         # print("add_with_artificial_variable", expr)
-        self.artificial_counter = self.artificial_counter + 1
-        av = SlackVariable(prefix='a', number=self.artificial_counter)
-        az = ObjectiveVariable('az')
-        az_row = expr.clone()
+        av = self.reuse_variable('a') or SlackVariable(prefix='a', number=self.take_number('artificial_counter'))
+        az = self.reuse_variable('az') or ObjectiveVariable('az')
+        az_row = self.new_row(expr.constant)
+        az_row.terms.update(expr.terms)
         # print('Before add_rows')
         # print(self)
         self.add_row(az, az_row)
@@ -376,17 +1564,28 @@ class SimplexSolver(Tableau):
         # print("azTableauRow.constant =", az_tableau_row.constant)
         if not approx_equal(az_tableau_row.constant, 0.0):
             # print("azTableauRow.constant is 0")
-            self.remove_row(az)
-            self.remove_column(av)
-            raise RequiredFailure()
+            # At the optimum, every term of the az row is a restricted
+            # variable with a positive coefficient, so az can't reach zero.
+            # The required constraints whose markers appear in the row are
+            # the ones that prevent it.
+            constraints = self.explain_row(az_tableau_row)
+            self.recycle_row(self.remove_row(az))
+            # The artificial variable's row is the only one that involves
+            # the new constraint; removing it leaves the tableau as it was.
+            self.remove_marker(av)
+            self.recycle_variable(av)
+            self.recycle_variable(az)
+            raise RequiredFailure(constraints=constraints)
 
         e = self.rows.get(av)
         if e is not None:
             # print("av exists")
             if e.is_constant:
                 # print("av is constant")
-                self.remove_row(av)
-                self.remove_row(az)
+                self.recycle_row(self.remove_row(av))
+                self.recycle_row(self.remove_row(az))
+                self.recycle_variable(av)
+                self.recycle_variable(az)
                 return
             entry_var = e.any_pivotable_variable()
             self.pivot(entry_var, av)
@@ -394,7 +1593,86 @@ class SimplexSolver(Tableau):
         # print("av shouldn't exist now")
         assert av not in self.rows
         self.remove_column(av)
-        self.remove_row(az)
+        self.recycle_row(self.remove_row(az))
+        self.recycle_variable(av)
+        self.recycle_variable(az)
+
+    def new_row(self, constant=0.0):
+        "An empty row, reused from the pool if possible"
+        if self.row_pool:
+            expr = self.row_pool.pop()
+            expr.constant = float(constant)
+            return expr
+        return Expression(constant=constant)
+
+    def recycle_row(self, expr):
+        "Keep a row that has been removed from the tableau for reuse"
+        if len(self.row_pool) < self.pool_size:
+            expr.terms.clear()
+            self.row_pool.append(expr)
+
+    def reuse_variable(self, prefix):
+        """An internal variable with the given name prefix from the pool.
+
+        Returns None if the pool is empty.
+        """
+        pool = self.variable_pool.get(prefix)
+        if pool:
+            v = pool.pop()
+            v.is_stay_error = False
+            return v
+        return None
+
+    def recycle_variable(self, v):
+        """Keep an internal variable that has left the tableau for reuse.
+
+        The variable's name is used to find its pool. A variable that still
+        appears in the tableau isn't recycled.
+        """
+        if v in self.rows or v in self.columns:
+            return
+        prefix = v.name.rstrip('0123456789')
+        pool = self.variable_pool.setdefault(prefix, [])
+        if len(pool) < self.pool_size:
+            pool.append(v)
+        elif prefix in NUMBER_COUNTERS:
+            # A pooled variable keeps its name; a discarded one gives its
+            # number back.
+            self.release_number(NUMBER_COUNTERS[prefix], int(v.name[len(prefix):]))
+
+    def take_number(self, counter):
+        """A number for a new internal variable, from the named counter.
+
+        Numbers that have been released are reused, lowest first, so the
+        counters (and names) don't grow without bound under churn.
+        """
+        free = self.free_numbers[counter]
+        if free:
+            number = min(free)
+            free.remove(number)
+            return number
+        number = getattr(self, counter) + 1
+        setattr(self, counter, number)
+        return number
+
+    def release_number(self, counter, number):
+        "Make the number of a discarded internal variable free for reuse"
+        free = self.free_numbers[counter]
+        free.add(number)
+        # Numbers at the top of the range are given back to the counter.
+        top = getattr(self, counter)
+        while top in free:
+            free.remove(top)
+            top = top - 1
+        setattr(self, counter, top)
+
+    def reset_numbering(self):
+        "Start the numbering of internal variables again"
+        self.slack_counter = 0
+        self.artificial_counter = 0
+        self.dummy_counter = 0
+        for free in self.free_numbers.values():
+            free.clear()
 
     def try_adding_directly(self, expr):
         # print("try_adding_directly", expr)
@@ -411,38 +1689,124 @@ class SimplexSolver(Tableau):
         # print("try_adding_directly returning: True")
         return True
 
+    def get_bounds(self):
+        "The bounds implied by the required constraints in the tableau"
+        if self.bounds is None:
+            self.bounds = Bounds()
+            for cn in self.marker_vars:
+                if Bounds.is_eligible(cn):
+                    self.bounds.add(cn)
+        return self.bounds
+
+    def remove_from_bounds(self, cn):
+        """Take a required constraint out of the bounds.
+
+        If propagating without it turns up a conflict (which can only be
+        rounding error), the bounds are discarded, to be rebuilt when
+        they are next needed.
+        """
+        if self.bounds is not None and self.bounds.remove(cn) is not None:
+            self.bounds = None
+
+    def add_to_bounds(self, cn):
+        """Check a new required constraint against the bounds.
+
+        Raises RequiredFailure if the bounds prove that the constraint is
+        infeasible. If they prove that it is redundant, it is recorded in
+        redundant_constraints, and None is returned. Otherwise, the
+        constraint is added to the bounds, and the trail needed to undo
+        that is returned.
+        """
+        bounds = self.get_bounds()
+        low, low_reasons, high, high_reasons = bounds.range(cn.expression)
+        if high < -EPSILON:
+            raise RequiredFailure(constraints=[cn] + list(high_reasons))
+        if not cn.is_inequality and low > EPSILON:
+            raise RequiredFailure(constraints=[cn] + list(low_reasons))
+
+        if cn.is_inequality and low > -EPSILON:
+            self.redundant_constraints[cn] = low_reasons
+            return None
+        if approx_equal(low, 0.0) and approx_equal(high, 0.0):
+            self.redundant_constraints[cn] = low_reasons | high_reasons
+            return None
+
+        conflict, trail = bounds.add(cn)
+        if conflict is not None:
+            bounds.undo(trail)
+            raise RequiredFailure(constraints=[cn] + [c for c in conflict if c is not cn])
+        return trail
+
+    def restore_redundant_constraints(self, cn):
+        """Add the redundant constraints that were implied by cn to the tableau.
+
+        Once cn has been removed or changed, they may no longer be implied.
+        """
+        for other, reasons in list(self.redundant_constraints.items()):
+            if cn in reasons:
+                del self.redundant_constraints[other]
+                self.add_constraint(other)
+
+    def explain_row(self, expr, subject=None):
+        """The required constraints whose marker variables appear in expr.
+
+        When a row proves that the required constraints are infeasible, the
+        row is a combination of the original constraints; a constraint is
+        part of that combination if and only if its marker variable
+        appears in the row, either as a term or as its subject.
+        """
+        constraints = dict((marker, cn) for cn, marker in self.marker_vars.items())
+        variables = list(expr.terms)
+        if subject is not None:
+            variables.insert(0, subject)
+        return [
+            constraints[v]
+            for v in variables
+            if v in constraints and constraints[v].is_required
+        ]
+
+    def subject_cost(self, v, expr):
+        """A Markowitz estimate of the fill-in caused by making v the subject of expr.
+
+        Substituting the new row into every row of v's column touches
+        each of those rows with every other term of expr.
+        """
+        col = self.columns.get(v)
+        if not col:
+            return 0
+        return len(col) * (len(expr.terms) - 1)
+
     def choose_subject(self, expr):
         # print('choose_subject', expr)
         subject = None
+        subject_cost = None
         found_unrestricted = False
         found_new_restricted = False
 
-        retval_found = False
-        retval = None
-        for v, c in expr.terms.items(): # CHECK??
-            if found_unrestricted:
-                if not v.is_restricted:
-                    if v not in self.columns:
-                        retval_found = True
-                        retval = v
-                        break
+        for v, c in expr.terms.items():
+            if v.is_restricted:
+                if not found_unrestricted and not found_new_restricted and not v.is_dummy and c < 0:
+                    col = self.columns.get(v)
+                    if col == None or (len(col) == 1 and self.objective in self.columns):
+                        subject = v
+                        found_new_restricted = True
             else:
-                if v.is_restricted:
-                    if not found_new_restricted and not v.is_dummy and c < 0:
-                        col = self.columns.get(v)
-                        if col == None or (len(col) == 1 and self.objective in self.columns):
-                            subject = v
-                            found_new_restricted = True
-                else:
+                # Of the unrestricted variables, choose the one that will
+                # cause the least fill-in, preferring larger coefficients
+                # for numerical stability.
+                cost = (self.subject_cost(v, expr), -abs(c))
+                if cost[0] == 0:
+                    return v
+                if not found_unrestricted or cost < subject_cost:
                     subject = v
+                    subject_cost = cost
                     found_unrestricted = True
 
-        if retval_found:
-            return retval
-
         if subject:
             return subject
 
+        retval_found = False
+        retval = None
         coeff = 0.0
         for v, c in expr.terms.items():
             if not v.is_dummy:
@@ -457,7 +1821,9 @@ class SimplexSolver(Tableau):
             return retval
 
         if not approx_equal(expr.constant, 0.0):
-            raise RequiredFailure()
+            # expr only contains the dummy variables of the required
+            # equations that the new constraint contradicts.
+            raise RequiredFailure(constraints=self.explain_row(expr))
 
         if coeff > 0:
             expr = expr * -1
@@ -486,30 +1852,109 @@ class SimplexSolver(Tableau):
                 expr.constant = expr.constant + (c * delta)
                 if basic_var.is_restricted and expr.constant < 0:
                     self.infeasible_rows.add(basic_var)
+                if basic_var.is_stay_error:
+                    self.changed_stay_rows.add(basic_var)
         except KeyError:
             pass
 
     def dual_optimize(self):
+        """Restore feasibility with the dual simplex method.
+
+        Returns the number of pivots that were needed.
+        """
         z_row = self.rows.get(self.objective)
+        pivots = 0
+        degenerate = 0
         while self.infeasible_rows:
-            exit_var = self.infeasible_rows.pop()
-            entry_var = None
-            expr = self.rows.get(exit_var)
-            if expr:
-                if expr.constant < 0:
-                    ratio = float('inf')
-                    for v, cd in expr.terms.items():
-                        if cd > 0 and v.is_pivotable:
-                            zc = z_row.coefficient_for(v)
-                            r = zc / cd
-                            if r < ratio: # JS difference?
-                                entry_var = v
-                                ratio = r
-                    if ratio == float('inf'):
-                        raise InternalError("ratio == nil (MAX_VALUE) in dual_optimize")
-                    self.pivot(entry_var, exit_var)
+            # After a run of degenerate pivots, use Bland's rule.
+            bland = degenerate >= self.degenerate_limit
+            exit_var = self.choose_dual_exit_var(bland)
+            if exit_var is None:
+                break
+            if not self.spend_budget():
+                return pivots
+            self.infeasible_rows.remove(exit_var)
+            expr = self.rows[exit_var]
+            entry_var = self.choose_dual_entry_var(expr, z_row, bland)
+            if entry_var is None:
+                # No combination of the parametric variables can make the
+                # row feasible; the required constraints whose markers are
+                # in the row conflict.
+                self.infeasible_rows.add(exit_var)
+                raise RequiredFailure(constraints=self.explain_row(expr, exit_var))
+            if approx_equal(z_row.coefficient_for(entry_var), 0.0):
+                degenerate = degenerate + 1
+            else:
+                degenerate = 0
+            self.pivot(entry_var, exit_var)
+            pivots = pivots + 1
+        self.infeasible_rows.clear()
+        return pivots
+
+    def choose_dual_exit_var(self, bland=False):
+        """Choose the infeasible row that should leave the basis.
+
+        Rows that have become feasible, or are no longer basic, are
+        discarded. Returns None if no infeasible rows remain.
+        """
+        candidates = []
+        for v in self.infeasible_rows:
+            expr = self.rows.get(v)
+            if expr is not None and expr.constant < 0:
+                candidates.append((v, expr))
+        if not candidates:
+            return None
+
+        if bland or self.dual_rule == 'first':
+            v, expr = min(candidates, key=lambda item: item[0].id)
+        elif self.dual_rule == 'most_infeasible':
+            v, expr = min(candidates, key=lambda item: (item[1].constant, item[0].id))
+        elif self.dual_rule == 'steepest_edge':
+            # The infeasibility of each row, normalized by the length of the
+            # row; the row norm stands in for the reference weights of the
+            # textbook rule, as the tableau is the only copy of the basis.
+            def weight(item):
+                v, expr = item
+                norm = 1.0 + sum(float(c) * float(c) for c in expr.terms.values())
+                return (-expr.constant * expr.constant / norm, v.id)
+            v, expr = min(candidates, key=weight)
+        else:
+            raise InternalError("Unknown dual simplex rule %r" % self.dual_rule)
+        return v
+
+    def choose_dual_entry_var(self, expr, z_row, bland=False):
+        """Choose the variable that should enter the basis, in place of expr's subject.
+
+        The dual ratio test; ties are broken by id. If harris_tolerance is
+        set, a two-pass Harris ratio test is used: the first pass finds the
+        largest step that keeps every reduced cost within the tolerance of
+        zero, and the second chooses the largest pivot element among the
+        candidates that fit within that step.
+        """
+        candidates = []
+        for v, cd in expr.terms.items():
+            if cd > 0 and v.is_pivotable:
+                candidates.append((v, cd, z_row.coefficient_for(v)))
+        if not candidates:
+            return None
+
+        if bland or self.harris_tolerance is None:
+            v, cd, zc = min(candidates, key=lambda item: (item[2] / item[1], item[0].id))
+            return v
+
+        bound = min((zc + self.harris_tolerance) / cd for v, cd, zc in candidates)
+        v, cd, zc = max(
+            (item for item in candidates if item[2] / item[1] <= bound),
+            key=lambda item: (item[1], -item[0].id)
+        )
+        return v
 
     def optimize(self, z_var):
+        """Minimize the row of z_var with the primal simplex method.
+
+        Returns True if the optimum was reached, or False if the budget
+        ran out first; the basis is feasible either way.
+        """
         # print("optimize", z_var)
         # print(self)
         self.optimize_count = self.optimize_count + 1
@@ -517,6 +1962,7 @@ class SimplexSolver(Tableau):
         z_row = self.rows[z_var]
         entry_var = None
         exit_var = None
+        degenerate = 0
 
         # print(self.objective)
         # print(z_var)
@@ -524,25 +1970,35 @@ class SimplexSolver(Tableau):
         # print(self.rows[z_var])
 
         while True:
-            objective_coeff = 0.0
-
-            # Not convinced the sort is correct here; but test suite
-            # doesn't pass reliably without it.
-            for v, c in sorted(z_row.terms.items(), key=lambda x: x[0].name):
+            entry_var = None
+            best = None
+
+            # Choose the candidate with the shortest column, as the pivot
+            # row is substituted into every row of that column; then the
+            # oldest, so the sequence of pivots is reproducible. After a
+            # run of degenerate pivots, only the age counts (Bland's rule).
+            # Coefficients within EPSILON of zero are rounding noise, and
+            # don't make a variable a candidate.
+            bland = degenerate >= self.degenerate_limit
+            for v, c in z_row.terms.items():
                 # print('term check', v, v.is_pivotable, c)
-                if v.is_pivotable and c < objective_coeff:
+                if v.is_pivotable and c < -EPSILON:
                     # print('candidate found')
-                    objective_coeff = c
-                    entry_var = v
-                    break;
+                    if bland:
+                        key = (v.id,)
+                    else:
+                        key = (len(self.columns[v]), v.id)
+                    if best is None or key < best:
+                        best = key
+                        entry_var = v
 
-            if objective_coeff >= -EPSILON or entry_var is None:
-                return
+            if entry_var is None:
+                return True
 
             # print('entry_var:', entry_var)
-            # print("objective_coeff:", objective_coeff)
 
             min_ratio = float('inf')
+            best = None
             r = 0
 
             for v in self.columns[entry_var]:
@@ -553,13 +2009,29 @@ class SimplexSolver(Tableau):
                     # print('pivotable, coeff =', coeff)
                     if coeff < 0:
                         r = -expr.constant / coeff
-                        if r < min_ratio:
+                        # Break ties in favour of the shortest row, as
+                        # that row is substituted into the entry column;
+                        # then in favour of the oldest variable. After a
+                        # run of degenerate pivots, only the age counts
+                        # (Bland's rule).
+                        if bland:
+                            key = (r, v.id)
+                        else:
+                            key = (r, len(expr.terms), v.id)
+                        if best is None or key < best:
+                            best = key
                             min_ratio = r
                             exit_var = v
 
             if min_ratio == float('inf'):
                 raise RequiredFailure('Objective function is unbounded')
 
+            if z_var is self.objective and not self.spend_budget():
+                return False
+            if approx_equal(min_ratio, 0.0):
+                degenerate = degenerate + 1
+            else:
+                degenerate = 0
             self.pivot(entry_var, exit_var)
 
             # print(self)
@@ -571,19 +2043,80 @@ class SimplexSolver(Tableau):
         if exit_var is None:
             print("WARN - exit_var is None")
 
-        p_expr = self.remove_row(exit_var)
-        p_expr.change_subject(exit_var, entry_var)
-        self.substitute_out(entry_var, p_expr)
-        self.add_row(entry_var, p_expr)
+        # This is remove_row(exit_var), change_subject(), substitute_out()
+        # and add_row(entry_var), fused into a single pass over the rows
+        # and columns. The results are identical, to the last bit.
+        rows = self.rows
+        columns = self.columns
+
+        p_expr = rows.pop(exit_var)
+        p_terms = p_expr.terms
+        reciprocal = 1.0 / p_terms.pop(entry_var)
+        scale = -reciprocal
+        p_expr.constant = p_expr.constant * scale
+
+        # Every column of the pivot row swaps exit_var for entry_var.
+        for clv, c in p_terms.items():
+            p_terms[clv] = c * scale
+            col = columns[clv]
+            col.remove(exit_var)
+            col.add(entry_var)
+            if clv.is_external:
+                self.external_parametric_vars.add(clv)
+        p_terms[exit_var] = reciprocal
+        columns.setdefault(exit_var, set()).add(entry_var)
+        if exit_var.is_external:
+            self.external_rows.discard(exit_var)
+            self.external_parametric_vars.add(exit_var)
+        self.infeasible_rows.discard(exit_var)
+
+        # Substitute the pivot row for entry_var in every other row that
+        # refers to it. Every column of the pivot row now contains
+        # entry_var, so none of them can become empty.
+        varset = columns.pop(entry_var)
+        varset.remove(exit_var)
+        p_constant = p_expr.constant
+        fill_in = 0
+        for v in varset:
+            row = rows[v]
+            terms = row.terms
+            multiplier = terms.pop(entry_var)
+            row.constant = row.constant + multiplier * p_constant
+            for clv, coeff in p_terms.items():
+                old_coefficient = terms.get(clv)
+                if old_coefficient:
+                    new_coefficient = old_coefficient + multiplier * coeff
+                    if abs(new_coefficient) < EPSILON:
+                        del terms[clv]
+                        columns[clv].remove(v)
+                    else:
+                        terms[clv] = new_coefficient
+                else:
+                    terms[clv] = multiplier * coeff
+                    columns[clv].add(v)
+                    fill_in = fill_in + 1
+            if v.is_restricted and row.constant < 0.0:
+                self.infeasible_rows.add(v)
+            if v.is_stay_error and p_constant:
+                self.changed_stay_rows.add(v)
+        self.fill_in = self.fill_in + fill_in
+
+        rows[entry_var] = p_expr
+        if entry_var.is_external:
+            self.external_rows.add(entry_var)
+            self.external_parametric_vars.discard(entry_var)
+        if entry_var.is_stay_error:
+            self.changed_stay_rows.add(entry_var)
 
     def reset_stay_constants(self):
         # print("reset_stay_constants")
-        for p_var, m_var in self.stay_error_vars:
-            expr = self.rows.get(p_var)
-            if expr is None:
-                expr = self.rows.get(m_var)
-            if expr:
+        # Only the stay rows whose constants have changed since the last
+        # reset need to be visited.
+        for v in self.changed_stay_rows:
+            expr = self.rows.get(v)
+            if expr is not None:
                 expr.constant = 0.0
+        self.changed_stay_rows.clear()
 
     def set_external_variables(self):
         # print("set_external_variables")
@@ -599,14 +2132,36 @@ class SimplexSolver(Tableau):
             v.value = expr.constant
 
         self.needs_solving = False
+        self.publish_external_variables()
 
-    def insert_error_var(self, cn, var):
-        # print('insert_error_var', cn, var)
-        constraint_set = self.error_vars.get(var)
-        if not constraint_set:
-            constraint_set = set()
-            self.error_vars[cn] = constraint_set
+    def publish_external_variables(self):
+        "Make the values of the external variables available to readers"
+        if self.publish_solutions:
+            self.publish_solution()
+
+        for buffer in self.solution_buffers:
+            buffer.publish()
 
-        constraint_set.add(var)
+    def add_solution_buffer(self, buffer):
+        "Publish the values of every solve into a shared SolutionBuffer"
+        self.solution_buffers.append(buffer)
+        buffer.publish()
 
-        self.error_vars.setdefault(var, set()).add(var)
+    def remove_solution_buffer(self, buffer):
+        self.solution_buffers.remove(buffer)
+
+    def publish_solution(self):
+        "Publish a snapshot of the current values of the external variables"
+        values = {}
+        for v in self.external_parametric_vars:
+            values[v] = v.value
+        for v in self.external_rows:
+            values[v] = v.value
+
+        # A single attribute assignment, so readers on other threads always
+        # see either the old solution or the new one.
+        self.solution = Solution(self.solution.version + 1, values)
+
+    def insert_error_var(self, cn, var):
+        # print('insert_error_var', cn, var)
+        self.error_vars.setdefault(cn, set()).add(var)
@@ -0,0 +1,34 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+
+class Solution(object):
+    """An immutable snapshot of the values of a solved system.
+
+    A solver publishes a new Solution at the end of each solve, by
+    replacing its ``solution`` attribute. Replacing an attribute is atomic,
+    so any thread can read ``solver.solution`` without locking, and will
+    always see a complete solution, even while the solver is part way
+    through the next solve.
+    """
+    __slots__ = ('version', 'values')
+
+    def __init__(self, version, values):
+        self.version = version
+        # Map of Variable to value. This must never be modified once the
+        # solution has been published.
+        self.values = values
+
+    def __repr__(self):
+        return '<Solution %s: %s variables>' % (self.version, len(self.values))
+
+    def __getitem__(self, var):
+        return self.values[var]
+
+    def __contains__(self, var):
+        return var in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, var, default=None):
+        return self.values.get(var, default)
@@ -1,5 +1,7 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
+import sys
+
 
 class Tableau(object):
     def __init__(self):
@@ -18,22 +20,100 @@ class Tableau(object):
         # Set of Variables.
         self.external_parametric_vars = set()
 
+        # Set of stay error variables whose row constant may have changed
+        # since the stay constants were last reset.
+        self.changed_stay_rows = set()
+
+        # The number of terms that have been created in existing rows by
+        # substitution (i.e., fill-in).
+        self.fill_in = 0
+
     def __repr__(self):
         parts = []
         parts.append('Tableau info:')
         parts.append('Rows: %s (= %s constraints)' % (len(self.rows), len(self.rows) - 1))
         parts.append('Columns: %s' % len(self.columns))
+        parts.append('Density: %.2f terms per row' % self.density())
         parts.append('Infeasible rows: %s' % len(self.infeasible_rows))
         parts.append('External basic variables: %s' % len(self.external_rows))
         parts.append('External parametric variables: %s' % len(self.external_parametric_vars))
         return '\n'.join(parts)
 
+    def density(self):
+        "The average number of terms in each row of the tableau"
+        if not self.rows:
+            return 0.0
+        return sum(len(expr.terms) for expr in self.rows.values()) / len(self.rows)
+
+    def memory_report(self):
+        """Describe the size of the tableau.
+
+        Returns a dictionary of entry counts, plus an estimate (in bytes)
+        of the memory used by the rows, columns and internal variables.
+        """
+        internal_vars = set()
+        size = sys.getsizeof(self.rows) + sys.getsizeof(self.columns)
+        size = size + sys.getsizeof(self.infeasible_rows)
+        size = size + sys.getsizeof(self.external_rows)
+        size = size + sys.getsizeof(self.external_parametric_vars)
+        terms = 0
+        for var, expr in self.rows.items():
+            size = size + sys.getsizeof(expr) + sys.getsizeof(expr.terms)
+            terms = terms + len(expr.terms)
+            internal_vars.add(var)
+        for var, varset in self.columns.items():
+            size = size + sys.getsizeof(varset)
+            internal_vars.add(var)
+        for var in internal_vars:
+            if not var.is_external:
+                size = size + sys.getsizeof(var) + sys.getsizeof(var.__dict__)
+
+        return {
+            'rows': len(self.rows),
+            'columns': len(self.columns),
+            'empty_columns': len([varset for varset in self.columns.values() if not varset]),
+            'terms': terms,
+            'infeasible_rows': len(self.infeasible_rows),
+            'external_rows': len(self.external_rows),
+            'external_parametric_vars': len(self.external_parametric_vars),
+            'bytes': size,
+        }
+
+    def snapshot(self):
+        """Copy the rows and columns of a feasible tableau.
+
+        The copy can be reinstated with restore(), as long as the set of
+        constraints hasn't changed in the meantime.
+        """
+        assert not self.infeasible_rows
+        return (
+            dict((var, expr.clone()) for var, expr in self.rows.items()),
+            dict((var, set(rows)) for var, rows in self.columns.items()),
+            set(self.external_rows),
+            set(self.external_parametric_vars),
+        )
+
+    def restore(self, snapshot):
+        "Reinstate a copy of the tableau made by snapshot()"
+        rows, columns, external_rows, external_parametric_vars = snapshot
+        # The snapshot must remain untouched, so that it can be restored again.
+        self.rows = dict((var, expr.clone()) for var, expr in rows.items())
+        self.columns = dict((var, set(col)) for var, col in columns.items())
+        self.external_rows = set(external_rows)
+        self.external_parametric_vars = set(external_parametric_vars)
+        self.infeasible_rows.clear()
+        self.changed_stay_rows.clear()
+
     def note_removed_variable(self, var, subject):
         if subject:
-            self.columns[var].remove(subject)
+            col = self.columns[var]
+            col.remove(subject)
+            if not col:
+                del self.columns[var]
 
     def note_added_variable(self, var, subject):
         if subject:
+            self.fill_in = self.fill_in + 1
             self.columns.setdefault(var, set()).add(subject)
 
     def add_row(self, var, expr):
@@ -48,6 +128,9 @@ class Tableau(object):
         if var.is_external:
             self.external_rows.add(var)
 
+        if var.is_stay_error:
+            self.changed_stay_rows.add(var)
+
         # print(self)
 
     def remove_column(self, var):
@@ -78,6 +161,8 @@ class Tableau(object):
             if varset:
                 # print("removing from varset", var)
                 varset.remove(var)
+                if not varset:
+                    del self.columns[clv]
 
         try:
             self.infeasible_rows.remove(var)
@@ -92,12 +177,14 @@ class Tableau(object):
         return expr
 
     def substitute_out(self, oldVar, expr):
-        varset = self.columns[oldVar]
+        varset = self.columns.pop(oldVar, ())
         for v in varset:
             row = self.rows[v]
             row.substitute_out(oldVar, expr, v, self)
             if v.is_restricted and row.constant < 0.0:
                 self.infeasible_rows.add(v)
+            if v.is_stay_error and expr.constant:
+                self.changed_stay_rows.add(v)
 
         if oldVar.is_external:
             self.external_rows.add(oldVar)
@@ -105,5 +192,3 @@ class Tableau(object):
                 self.external_parametric_vars.remove(oldVar)
             except KeyError:
                 pass
-
-        del self.columns[oldVar]
@@ -8,6 +8,11 @@ STRONG = 1000000
 MEDIUM = 1000
 WEAK = 1
 
+# The numeric strengths are spaced by this factor; each "digit" of a
+# numeric strength in this base is one level of a symbolic weight.
+STRENGTH_BASE = 1000
+STRENGTH_LEVELS = 3
+
 
 def approx_equal(a, b, epsilon=EPSILON):
     "A comparison mechanism for floats"
@@ -27,4 +32,176 @@ def repr_strength(strength):
         STRONG: 'Strong',
         MEDIUM: 'Medium',
         WEAK: 'Weak'
-    }[strength]
+    }.get(strength, repr(strength))
+
+
+class SymbolicWeight(object):
+    """A strength made up of any number of levels, compared lexicographically.
+
+    The first level is the most significant; no amount of weight at a lower
+    level can outweigh a single unit at a higher level. Levels that are
+    within EPSILON of zero are treated as zero when comparing, so noise
+    accumulated at one level can't flip a comparison that is decided at a
+    more significant level.
+
+    Scalars can be combined with a symbolic weight; a scalar behaves as if
+    it had the same value at every level.
+    """
+    __slots__ = ('levels',)
+
+    def __init__(self, *levels):
+        self.levels = tuple(float(level) for level in levels)
+
+    @classmethod
+    def from_strength(cls, strength, levels=STRENGTH_LEVELS):
+        """Convert a numeric strength into a symbolic weight.
+
+        Each base-1000 digit of the strength becomes a level, so STRONG,
+        MEDIUM and WEAK map onto the three levels (1, 0, 0), (0, 1, 0) and
+        (0, 0, 1). Anything left over after the least significant level
+        stays on that level.
+        """
+        if isinstance(strength, SymbolicWeight):
+            return strength
+
+        remainder = float(strength)
+        parts = []
+        for level in range(levels - 1, 0, -1):
+            scale = STRENGTH_BASE ** level
+            digit = remainder // scale
+            parts.append(digit)
+            remainder = remainder - digit * scale
+        parts.append(remainder)
+        return cls(*parts)
+
+    def __repr__(self):
+        return '{%s}' % ', '.join(repr(level) for level in self.levels)
+
+    def __float__(self):
+        value = 0.0
+        for level in self.levels:
+            value = value * STRENGTH_BASE + level
+        return value
+
+    def _coerce(self, other):
+        if isinstance(other, SymbolicWeight):
+            return other.levels
+        elif isinstance(other, (float, int)):
+            return (float(other),) * len(self.levels)
+        return None
+
+    def _combine(self, other, op):
+        levels = self._coerce(other)
+        if levels is None:
+            return NotImplemented
+        size = max(len(self.levels), len(levels))
+        mine = self.levels + (0.0,) * (size - len(self.levels))
+        theirs = levels + (0.0,) * (size - len(levels))
+        return SymbolicWeight(*[op(a, b) for a, b in zip(mine, theirs)])
+
+    def _sign(self):
+        for level in self.levels:
+            if level <= -EPSILON:
+                return -1
+            elif level >= EPSILON:
+                return 1
+        return 0
+
+    def _compare(self, other):
+        # Scalars within EPSILON of zero (e.g., the -EPSILON optimality
+        # threshold) are exactly zero in symbolic terms.
+        if isinstance(other, (float, int)) and abs(other) <= EPSILON:
+            return self._sign()
+        difference = self._combine(other, lambda a, b: a - b)
+        if difference is NotImplemented:
+            return None
+        return difference._sign()
+
+    ######################################################################
+    # Mathematical operators
+    ######################################################################
+
+    def __add__(self, x):
+        return self._combine(x, lambda a, b: a + b)
+
+    __radd__ = __add__
+
+    def __sub__(self, x):
+        return self._combine(x, lambda a, b: a - b)
+
+    def __rsub__(self, x):
+        return self._combine(x, lambda a, b: b - a)
+
+    def __mul__(self, x):
+        if isinstance(x, (float, int)):
+            return SymbolicWeight(*[level * x for level in self.levels])
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, x):
+        return self.__div__(x)
+
+    def __div__(self, x):
+        if isinstance(x, (float, int)):
+            return SymbolicWeight(*[level / x for level in self.levels])
+        return NotImplemented
+
+    def __neg__(self):
+        return SymbolicWeight(*[-level for level in self.levels])
+
+    def __abs__(self):
+        # Like complex numbers, the magnitude is a plain float; it is only
+        # used to decide if a coefficient has become (approximately) zero.
+        return max([abs(level) for level in self.levels] or [0.0])
+
+    def __bool__(self):
+        return any(self.levels)
+
+    __nonzero__ = __bool__
+
+    ######################################################################
+    # Comparison operators
+    ######################################################################
+
+    def __hash__(self):
+        levels = list(self.levels)
+        while levels and levels[-1] == 0:
+            levels.pop()
+        return hash(tuple(levels))
+
+    def __eq__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result == 0
+
+    def __ne__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result != 0
+
+    def __lt__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result < 0
+
+    def __le__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result <= 0
+
+    def __gt__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result > 0
+
+    def __ge__(self, other):
+        result = self._compare(other)
+        if result is None:
+            return NotImplemented
+        return result >= 0
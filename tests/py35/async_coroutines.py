@@ -0,0 +1,42 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+# The coroutines used by test_async_solver. async def is a syntax error
+# before Python 3.5, so they are kept in a module that is only imported on
+# versions that support it. The directory deliberately has no __init__.py,
+# so that the test loader doesn't import it when scanning the tests package;
+# it is imported as a namespace package.
+
+import asyncio
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def coalesced(service, x, y):
+    "Suggest values for x and y, and read them back, in the same tick"
+    async def drag():
+        await service.suggest(x, 30)
+
+    async def resize():
+        await service.suggest(y, 40)
+
+    async def read():
+        return await service.values([x, y])
+
+    return await asyncio.gather(drag(), resize(), read())
+
+
+async def repeated(service, x, y):
+    "Suggest several values for x in one tick, then another in the next"
+    await asyncio.gather(
+        service.suggest(x, 50),
+        service.suggest(x, 60),
+    )
+    first = await service.values([x, y])
+    await service.suggest(x, 5)
+    return first, await service.values([x, y])
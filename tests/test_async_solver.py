@@ -0,0 +1,69 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import sys
+from unittest import TestCase
+if not hasattr(TestCase, 'assertIsNotNone'):
+    # For Python2.6 compatibility
+    from unittest2 import TestCase
+try:
+    from unittest import skipIf
+except ImportError:
+    # For Python2.6 compatibility
+    from unittest2 import skipIf
+
+from cassowary import Variable, SimplexSolver
+
+# Internals
+from cassowary.expression import Constraint
+
+if sys.version_info >= (3, 5):
+    from cassowary.async_solver import AsyncSolver
+    from tests.py35.async_coroutines import run_async, coalesced, repeated
+
+
+@skipIf(sys.version_info < (3, 5), "AsyncSolver requires Python 3.5")
+class AsyncSolverTestCase(TestCase):
+    def setUp(self):
+        self.solver = SimplexSolver()
+        self.x = Variable('x', 10)
+        self.y = Variable('y', 20)
+        self.solver.add_stay(self.x)
+        self.solver.add_stay(self.y)
+        self.solver.add_constraint(Constraint(self.x, Constraint.LEQ, self.y))
+
+    def test_suggestions_coalesce(self):
+        "Suggestions made in the same tick are applied with one resolve"
+        service = AsyncSolver(self.solver)
+        x, y = self.x, self.y
+
+        resolves = self.solver.resolve_count
+        _, _, values = run_async(coalesced(service, x, y))
+
+        self.assertEqual(self.solver.resolve_count, resolves + 1)
+        self.assertEqual(service.flush_count, 1)
+        self.assertAlmostEqual(values[0], 30)
+        self.assertAlmostEqual(values[1], 40)
+        self.assertAlmostEqual(x.value, 30)
+        self.assertAlmostEqual(y.value, 40)
+
+        service.close()
+        self.assertEqual(len(self.solver.edit_var_map), 0)
+
+    def test_last_suggestion_wins(self):
+        "Repeated suggestions for a variable in one tick keep the last value"
+        service = AsyncSolver(self.solver)
+        x, y = self.x, self.y
+
+        first, second = run_async(repeated(service, x, y))
+        self.assertEqual(service.flush_count, 2)
+        self.assertAlmostEqual(first[0], 60)
+        self.assertAlmostEqual(first[1], 60)
+        self.assertAlmostEqual(second[0], 5)
+        self.assertAlmostEqual(second[1], 60)
+
+    def test_values_without_suggestions(self):
+        "Values can be read without any pending suggestions"
+        service = AsyncSolver(self.solver)
+        values = run_async(service.values([self.x, self.y]))
+        self.assertEqual(values, [10, 20])
+        self.assertEqual(service.flush_count, 0)
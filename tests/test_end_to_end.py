@@ -1,15 +1,16 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
+import gc
 import random
 from unittest import TestCase
 if not hasattr(TestCase, 'assertIsNotNone'):
     # For Python2.6 compatibility
     from unittest2 import TestCase
 
-from cassowary import RequiredFailure, SimplexSolver, STRONG, WEAK, MEDIUM, REQUIRED, Variable
+from cassowary import ConstraintNotFound, InternalError, Parameter, RequiredFailure, SimplexSolver, SymbolicWeight, STRONG, WEAK, MEDIUM, REQUIRED, Variable
 
 # Internals
-from cassowary.expression import Constraint
+from cassowary.expression import Constraint, EditConstraint, StayConstraint
 from cassowary.utils import approx_equal
 
 
@@ -768,3 +769,760 @@ class EndToEndTestCase(TestCase):
         self.assertAlmostEqual(left.value, 40)
         self.assertAlmostEqual(middle.value, 45)
         self.assertAlmostEqual(right.value, 50)
+
+    def test_symbolic_strengths(self):
+        "Symbolic strengths don't let many weak errors outweigh a strong one"
+        for symbolic, expected in [(False, 10), (True, 0)]:
+            solver = SimplexSolver(symbolic=symbolic)
+            x = Variable('x', 0)
+            solver.add_stay(x, STRONG)
+            solver.add_constraint(Constraint(x, Constraint.EQ, 10, strength=WEAK, weight=2000000))
+
+            self.assertAlmostEqual(x.value, expected)
+
+    def test_symbolic_custom_levels(self):
+        "Symbolic strengths can use any number of levels"
+        solver = SimplexSolver(symbolic=True)
+        a = Variable('a')
+        b = Variable('b')
+
+        solver.add_constraint(Constraint(a, Constraint.EQ, 10, strength=MEDIUM))
+        solver.add_constraint(Constraint(a, Constraint.EQ, 20, strength=SymbolicWeight(0, 0, 1, 0)))
+        solver.add_constraint(Constraint(a, Constraint.GEQ, b))
+        solver.add_constraint(Constraint(b, Constraint.EQ, 30, strength=SymbolicWeight(0, 0, 0, 5)))
+
+        self.assertAlmostEqual(a.value, 10)
+        self.assertAlmostEqual(b.value, 10)
+
+    def test_symbolic_edit(self):
+        "Edits work with symbolic strengths"
+        solver = SimplexSolver(symbolic=True)
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 50)
+
+        self.assertAlmostEqual(x.value, 50)
+        self.assertAlmostEqual(y.value, 50)
+
+    def test_owned_constraints(self):
+        "Constraints are removed once their owner has been garbage collected"
+        class Widget(object):
+            pass
+
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+
+        widget = Widget()
+        solver.add_constraint(Constraint(x, Constraint.GEQ, 50), owner=widget)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 2), owner=widget)
+        self.assertAlmostEqual(x.value, 50)
+        self.assertAlmostEqual(y.value, 100)
+        self.assertEqual(len(solver.owned_constraints), 2)
+
+        del widget
+        gc.collect()
+
+        # Removal is deferred until the next solve.
+        self.assertEqual(len(solver.finalized_constraints), 2)
+        self.assertEqual(len(solver.marker_vars), 4)
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 5)
+
+        self.assertEqual(len(solver.finalized_constraints), 0)
+        self.assertEqual(len(solver.owned_constraints), 0)
+        self.assertEqual(len(solver.marker_vars), 2)
+        self.assertAlmostEqual(x.value, 5)
+        self.assertAlmostEqual(y.value, 100)
+
+    def test_owned_constraints_rebuild(self):
+        "Constraints whose owners have been collected are removed before a rebuild"
+        class Widget(object):
+            pass
+
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(y, Constraint.GEQ, 30))
+
+        widget = Widget()
+        solver.add_constraint(Constraint(x, Constraint.GEQ, 50), owner=widget)
+        self.assertAlmostEqual(x.value, 50)
+        del widget
+        gc.collect()
+
+        solver.rebuild()
+        self.assertEqual(len(solver.finalized_constraints), 0)
+        self.assertEqual(len(solver.owned_constraints), 0)
+        self.assertEqual(len(solver.marker_vars), 3)
+        self.assertAlmostEqual(x.value, 50)
+        self.assertAlmostEqual(y.value, 30)
+
+        # Owners collected while the tableau is being rebuilt are only
+        # dealt with once it is complete.
+        widget = Widget()
+        cn = solver.add_constraint(Constraint(x, Constraint.LEQ, 60), owner=widget)
+        solver.finalized_constraints.append(cn)
+        solver.rebuilding = True
+        try:
+            solver.add_constraint(Constraint(y, Constraint.LEQ, 100))
+        finally:
+            solver.rebuilding = False
+        self.assertEqual(solver.finalized_constraints, [cn])
+        self.assertIn(cn, solver.marker_vars)
+
+    def test_owner_without_weakref(self):
+        "An owner that can't be weakly referenced is rejected up front"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        solver.add_stay(x)
+        cn = Constraint(x, Constraint.GEQ, 10)
+        with self.assertRaises(TypeError):
+            solver.add_constraint(cn, owner=(1, 2))
+        self.assertNotIn(cn, solver.marker_vars)
+        self.assertEqual(len(solver.rows), 2)
+        self.assertAlmostEqual(x.value, 0)
+
+    def test_owned_constraint_removed_explicitly(self):
+        "An owned constraint can still be removed explicitly"
+        class Widget(object):
+            pass
+
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        solver.add_stay(x)
+
+        widget = Widget()
+        cn = solver.add_constraint(Constraint(x, Constraint.GEQ, 50), owner=widget)
+        solver.remove_constraint(cn)
+        del widget
+        gc.collect()
+
+        self.assertEqual(len(solver.finalized_constraints), 0)
+        solver.solve()
+        self.assertEqual(len(solver.marker_vars), 1)
+
+    def test_deduplicate(self):
+        "Equivalent constraints share a single row in the tableau"
+        solver = SimplexSolver()
+        solver.deduplicate = True
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y, strength=WEAK)
+
+        cn = solver.add_constraint(Constraint(x, Constraint.EQ, y))
+        rows = len(solver.rows)
+        self.assertIs(solver.add_constraint(Constraint(y, Constraint.EQ, x)), cn)
+        self.assertIs(solver.add_constraint(Constraint(x * 2, Constraint.EQ, y * 2)), cn)
+        self.assertEqual(solver.references(cn), 3)
+        self.assertEqual(len(solver.rows), rows)
+        self.assertEqual(len(solver.marker_vars), 3)
+
+        # Scaling a non-required constraint changes its error, so it isn't
+        # equivalent; neither is a constraint of a different strength.
+        self.assertIsNot(solver.add_constraint(Constraint(x, Constraint.EQ, 30, strength=WEAK)),
+                         solver.add_constraint(Constraint(x * 2, Constraint.EQ, 60, strength=WEAK)))
+        self.assertIsNot(solver.add_constraint(Constraint(x, Constraint.GEQ, 0)),
+                         solver.add_constraint(Constraint(x, Constraint.GEQ, 0, strength=STRONG)))
+
+        # A reference can be released through an equivalent constraint.
+        solver.remove_constraint(Constraint(y, Constraint.EQ, x))
+        solver.remove_constraint(cn)
+        self.assertEqual(solver.references(cn), 1)
+        self.assertAlmostEqual(x.value, y.value)
+
+        solver.remove_constraint(cn)
+        self.assertNotIn(cn, solver.marker_vars)
+        self.assertEqual(len(solver.shared_constraints), 4)
+        with self.assertRaises(ConstraintNotFound):
+            solver.remove_constraint(cn)
+
+    def test_deduplicate_changes(self):
+        "A shared constraint can be changed and owned"
+        class Widget(object):
+            pass
+
+        solver = SimplexSolver()
+        solver.deduplicate = True
+        x = Variable('x', 10)
+        solver.add_stay(x)
+
+        first = Widget()
+        second = Widget()
+        cn = solver.add_constraint(Constraint(x, Constraint.GEQ, 50), owner=first)
+        self.assertIs(solver.add_constraint(Constraint(x, Constraint.GEQ, 50), owner=second), cn)
+        self.assertEqual(solver.references(cn), 2)
+
+        # A shared constraint can't be changed in place; equivalent
+        # constraints may be scaled differently.
+        other = solver.add_constraint(Constraint(x * 2, Constraint.GEQ, 100))
+        self.assertIs(other, cn)
+        with self.assertRaises(InternalError):
+            solver.update_constant(cn, -60)
+        solver.remove_constraint(other)
+        soft = solver.add_constraint(Constraint(x, Constraint.LEQ, 0, strength=WEAK))
+        self.assertIs(solver.add_constraint(Constraint(x, Constraint.LEQ, 0, strength=WEAK)), soft)
+        with self.assertRaises(InternalError):
+            solver.change_strength(soft, MEDIUM)
+
+        # Each owner releases one reference.
+        del first
+        gc.collect()
+        solver.solve()
+        self.assertEqual(solver.references(cn), 1)
+
+        # With a single reference, the constraint can be changed, and the
+        # key follows the constant.
+        solver.update_constant(cn, -60)
+        self.assertAlmostEqual(x.value, 60)
+        self.assertIsNot(solver.add_constraint(Constraint(x, Constraint.GEQ, 50)), cn)
+        self.assertIs(solver.add_constraint(Constraint(x, Constraint.GEQ, 60)), cn)
+        solver.remove_constraint(cn)
+
+        del second
+        gc.collect()
+        solver.solve()
+        self.assertNotIn(cn, solver.marker_vars)
+
+        # Without deduplication, every constraint is added.
+        solver.deduplicate = False
+        self.assertIsNot(solver.add_constraint(Constraint(x, Constraint.GEQ, 70)),
+                         solver.add_constraint(Constraint(x, Constraint.GEQ, 70)))
+
+    def test_reconcile(self):
+        "The installed constraints can be reconciled with a desired set"
+        solver = SimplexSolver()
+        left = Variable('left', 0)
+        width = Variable('width', 0)
+        right = Variable('right', 0)
+        solver.add_stay(left)
+        solver.add_stay(width, strength=WEAK)
+        solver.add_stay(right, strength=WEAK)
+        # Constraints that weren't installed by reconcile() are left alone.
+        outside = solver.add_constraint(Constraint(left, Constraint.GEQ, 0))
+
+        def frame(margin, preferred, strength=MEDIUM):
+            return [
+                Constraint(right, Constraint.EQ, left + width),
+                Constraint(left, Constraint.GEQ, margin),
+                Constraint(width, Constraint.EQ, preferred, strength=strength),
+            ]
+
+        installed = solver.reconcile(frame(10, 100))
+        self.assertAlmostEqual(left.value, 10)
+        self.assertAlmostEqual(right.value, 110)
+        markers = len(solver.marker_vars)
+        version = solver.constraint_version
+
+        # Nothing has changed, so nothing is done.
+        self.assertEqual(solver.reconcile(frame(10, 100)), installed)
+        self.assertEqual(solver.constraint_version, version)
+
+        # An equality can be written the other way around.
+        desired = frame(10, 100)
+        desired[0] = Constraint(left + width, Constraint.EQ, right)
+        self.assertEqual(solver.reconcile(desired), installed)
+        self.assertEqual(solver.constraint_version, version)
+
+        # Constants and strengths are updated in place.
+        self.assertEqual(solver.reconcile(frame(20, 50, STRONG)), installed)
+        self.assertAlmostEqual(left.value, 20)
+        self.assertAlmostEqual(width.value, 50)
+        self.assertAlmostEqual(right.value, 70)
+        self.assertEqual(installed[2].strength, STRONG)
+        self.assertEqual(len(solver.marker_vars), markers)
+
+        # A constraint that becomes required is replaced.
+        result = solver.reconcile(frame(20, 60, REQUIRED))
+        self.assertEqual(result[:2], installed[:2])
+        self.assertIsNot(result[2], installed[2])
+        self.assertNotIn(installed[2], solver.marker_vars)
+        self.assertAlmostEqual(right.value, 80)
+        self.assertEqual(len(solver.marker_vars), markers)
+
+        # Constraints that are no longer wanted are removed.
+        solver.reconcile(frame(20, 60, REQUIRED)[1:])
+        self.assertNotIn(installed[0], solver.marker_vars)
+        self.assertEqual(len(solver.marker_vars), markers - 1)
+
+        solver.reconcile([])
+        self.assertEqual(list(solver.marker_vars), [c for c in solver.marker_vars if c.is_stay_constraint] + [outside])
+        self.assertEqual(solver.reconciled, {})
+
+    def test_reconcile_shared(self):
+        "Reconciling doesn't change a constraint that is shared with another caller"
+        solver = SimplexSolver()
+        solver.deduplicate = True
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        solver.add_stay(x, strength=WEAK)
+        solver.add_stay(y, strength=WEAK)
+
+        mine = solver.add_constraint(Constraint(x, Constraint.EQ, 10), strength=STRONG)
+        self.assertEqual(solver.reconcile([Constraint(x, Constraint.EQ, 10, strength=STRONG)]), [mine])
+        self.assertEqual(solver.references(mine), 2)
+
+        result = solver.reconcile([Constraint(x, Constraint.EQ, 50, strength=MEDIUM)])
+        self.assertIsNot(result[0], mine)
+        self.assertEqual(mine.expression.constant, 10)
+        self.assertEqual(mine.strength, STRONG)
+        self.assertEqual(solver.references(mine), 1)
+        self.assertAlmostEqual(x.value, 10)
+
+        solver.reconcile([])
+        self.assertIn(mine, solver.marker_vars)
+        self.assertNotIn(result[0], solver.marker_vars)
+
+    def test_reconcile_stays(self):
+        "Stays can be reconciled; edit constraints are rejected"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+
+        def desired(strength=WEAK):
+            return [
+                StayConstraint(x, strength),
+                StayConstraint(y, WEAK),
+                Constraint(x + y, Constraint.EQ, 100, strength=STRONG),
+            ]
+
+        stay_x, stay_y, total = solver.reconcile(desired())
+        self.assertAlmostEqual(x.value + y.value, 100)
+        rows = len(solver.rows)
+
+        # The stays are kept, even though the values (and so the
+        # constants of the new stays) have changed.
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 30)
+        self.assertAlmostEqual(y.value, 70)
+        optimize_count = solver.optimize_count
+        self.assertEqual(solver.reconcile(desired()), [stay_x, stay_y, total])
+        self.assertEqual(solver.optimize_count, optimize_count)
+
+        # A change of strength is made in place.
+        self.assertEqual(solver.reconcile(desired(MEDIUM)), [stay_x, stay_y, total])
+        self.assertEqual(stay_x.strength, MEDIUM)
+        self.assertEqual(len(solver.rows), rows)
+
+        with self.assertRaises(InternalError):
+            solver.reconcile(desired() + [EditConstraint(x)])
+        self.assertIn(stay_x, solver.marker_vars)
+
+    def test_change_strength(self):
+        "The strength and weight of a constraint can be changed in place"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        solver.add_stay(x, WEAK)
+        cn = solver.add_constraint(Constraint(x, Constraint.EQ, 50, strength=WEAK, weight=0.5))
+        self.assertAlmostEqual(x.value, 10)
+
+        slack_counter = solver.slack_counter
+        solver.change_strength(cn, STRONG)
+        self.assertAlmostEqual(x.value, 50)
+
+        solver.change_strength(cn, weight=0.25)
+        self.assertAlmostEqual(x.value, 50)
+
+        solver.change_strength(cn, WEAK)
+        self.assertAlmostEqual(x.value, 10)
+
+        solver.change_strength(cn, weight=2)
+        self.assertAlmostEqual(x.value, 50)
+
+        # No new slack or error variables were needed.
+        self.assertEqual(solver.slack_counter, slack_counter)
+
+        # The constraint can still be removed.
+        solver.remove_constraint(cn)
+        self.assertAlmostEqual(x.value, 50)
+        self.assertEqual(len(solver.rows[solver.objective].terms), 2)
+
+    def test_change_strength_symbolic(self):
+        "Strengths can be changed in a symbolic solver"
+        solver = SimplexSolver(symbolic=True)
+        x = Variable('x', 10)
+        solver.add_stay(x, MEDIUM)
+        cn = solver.add_constraint(Constraint(x, Constraint.LEQ, 5, strength=WEAK, weight=1000))
+        self.assertAlmostEqual(x.value, 10)
+
+        solver.change_strength(cn, STRONG)
+        self.assertAlmostEqual(x.value, 5)
+
+    def test_change_strength_required(self):
+        "The strength of a required constraint can't be changed"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        cn = solver.add_constraint(Constraint(x, Constraint.GEQ, 0))
+        with self.assertRaises(InternalError):
+            solver.change_strength(cn, WEAK)
+
+        weak = solver.add_constraint(Constraint(x, Constraint.GEQ, 5, strength=WEAK))
+        with self.assertRaises(InternalError):
+            solver.change_strength(weak, REQUIRED)
+
+        with self.assertRaises(ConstraintNotFound):
+            solver.change_strength(Constraint(x, Constraint.GEQ, 5, strength=WEAK), STRONG)
+
+    def test_update_constant(self):
+        "The constant of a constraint can be changed in place"
+        solver = SimplexSolver()
+        left = Variable('left', 0)
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        z = Variable('z', 0)
+        solver.add_stay(left, strength=STRONG)
+        solver.add_stay(x)
+        solver.add_stay(z)
+        c1 = solver.add_constraint(Constraint(x, Constraint.GEQ, left + 50))
+        c2 = solver.add_constraint(Constraint(y, Constraint.EQ, x + 10))
+        c3 = solver.add_constraint(Constraint(z, Constraint.EQ, 30, strength=STRONG))
+        self.assertAlmostEqual(x.value, 50)
+        self.assertAlmostEqual(y.value, 60)
+        self.assertAlmostEqual(z.value, 30)
+
+        slack_counter = solver.slack_counter
+
+        # The constant of x >= left + 50 is stored as -50.
+        solver.update_constant(c1, -60)
+        self.assertAlmostEqual(x.value, 60)
+        self.assertAlmostEqual(y.value, 70)
+
+        solver.update_constant(c2, 5)
+        self.assertAlmostEqual(y.value, 65)
+
+        solver.update_constant(c3, 100)
+        self.assertAlmostEqual(z.value, 100)
+
+        solver.update_constant(c1, -20)
+        self.assertAlmostEqual(left.value, 0)
+        self.assertAlmostEqual(x.value, 60)
+        self.assertAlmostEqual(y.value, 65)
+
+        self.assertEqual(solver.slack_counter, slack_counter)
+
+        # The updated constraints behave as if they had been added that way.
+        solver.remove_constraint(c3)
+        self.assertAlmostEqual(z.value, 100)
+        solver.add_edit_var(x, strength=MEDIUM)
+        with solver.edit():
+            solver.suggest_value(x, 0)
+        self.assertAlmostEqual(left.value, 0)
+        self.assertAlmostEqual(x.value, 20)
+        self.assertAlmostEqual(y.value, 25)
+
+    def test_parameters(self):
+        "Parameters shared between constraints can be changed"
+        solver = SimplexSolver()
+        gap = Parameter('gap', 10)
+        a = Variable('a', 0)
+        b = Variable('b', 0)
+        c = Variable('c', 0)
+        solver.add_stay(a, strength=STRONG)
+        solver.add_stay(b)
+        solver.add_constraint(Constraint(b, Constraint.GEQ, a + gap))
+        solver.add_constraint(Constraint(c, Constraint.EQ, b + gap * 2))
+        self.assertAlmostEqual(b.value, 10)
+        self.assertAlmostEqual(c.value, 30)
+
+        solver.set_parameter(gap, 15)
+        self.assertAlmostEqual(a.value, 0)
+        self.assertAlmostEqual(b.value, 15)
+        self.assertAlmostEqual(c.value, 45)
+
+        solver.set_parameter(gap, 5)
+        self.assertAlmostEqual(b.value, 15)
+        self.assertAlmostEqual(c.value, 25)
+
+        # Parameters never become part of the tableau.
+        self.assertNotIn(gap, solver.columns)
+        self.assertNotIn(gap, solver.rows)
+
+    def test_update_constant_required_failure(self):
+        "Updating a constant can't contradict the required constraints"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        c1 = solver.add_constraint(Constraint(x, Constraint.EQ, 10))
+        cn = solver.add_constraint(Constraint(x * 2, Constraint.EQ, 20))
+
+        with self.assertRaises(RequiredFailure) as context:
+            solver.update_constant(cn, -30)
+        self.assertEqual(set(context.exception.constraints), set([c1, cn]))
+        self.assertEqual(cn.expression.constant, -20)
+        self.assertAlmostEqual(x.value, 10)
+
+    def test_update_constant_inequality_failure(self):
+        "An update that makes required inequalities conflict is undone"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        solver.add_stay(x, strength=WEAK)
+        c1 = solver.add_constraint(Constraint(x, Constraint.LEQ, 20))
+        cn = solver.add_constraint(Constraint(x, Constraint.GEQ, 10))
+        self.assertAlmostEqual(x.value, 10)
+
+        with self.assertRaises(RequiredFailure) as context:
+            solver.update_constant(cn, -30)
+        self.assertEqual(set(context.exception.constraints), set([c1, cn]))
+        self.assertEqual(cn.expression.constant, -10)
+        self.assertAlmostEqual(x.value, 10)
+        self.assertEqual(len(solver.infeasible_rows), 0)
+
+        # The tableau is still consistent with the original constraints.
+        solver.add_stay(x)
+        self.assertAlmostEqual(x.value, 10)
+        solver.update_constant(cn, -15)
+        self.assertAlmostEqual(x.value, 15)
+
+    def test_set_parameter_failure(self):
+        "A parameter value that makes required constraints conflict is undone"
+        solver = SimplexSolver()
+        y = Variable('y', 0)
+        p = Parameter('p', 10)
+        solver.add_stay(y, strength=WEAK)
+        c1 = solver.add_constraint(Constraint(y, Constraint.GEQ, p))
+        c2 = solver.add_constraint(Constraint(y, Constraint.LEQ, 20))
+        self.assertAlmostEqual(y.value, 10)
+
+        with self.assertRaises(RequiredFailure) as context:
+            solver.set_parameter(p, 30)
+        self.assertEqual(set(context.exception.constraints), set([c1, c2]))
+        self.assertEqual(p.value, 10)
+        self.assertAlmostEqual(y.value, 10)
+
+        solver.add_stay(y)
+        self.assertAlmostEqual(y.value, 10)
+        solver.set_parameter(p, 15)
+        self.assertAlmostEqual(y.value, 15)
+
+    def test_required_failure_explanation(self):
+        "A required failure reports the constraints involved in the conflict"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        c1 = solver.add_constraint(Constraint(x, Constraint.GEQ, 10))
+        solver.add_constraint(Constraint(y, Constraint.EQ, 3))
+        c3 = Constraint(x, Constraint.LEQ, 5)
+
+        with self.assertRaises(RequiredFailure) as context:
+            solver.add_constraint(c3)
+        self.assertEqual(set(context.exception.constraints), set([c1, c3]))
+        self.assertEqual(context.exception.constraints[0], c3)
+        self.assertNotIn(c3, solver.marker_vars)
+
+    def test_required_failure_cleanup(self):
+        "A constraint that fails to be added leaves nothing behind"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        p = Parameter('p', 5)
+        solver.add_stay(x, strength=WEAK)
+        solver.add_stay(y, strength=WEAK)
+        solver.add_constraint(Constraint(x, Constraint.GEQ, 10))
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 2))
+        report = solver.memory_report()
+
+        for i in range(5):
+            for cn in [
+                Constraint(x, Constraint.LEQ, 5),
+                Constraint(x, Constraint.LEQ, p),
+                Constraint(y, Constraint.EQ, 4),
+                Constraint(x + y, Constraint.LEQ, 12),
+            ]:
+                with self.assertRaises(RequiredFailure):
+                    solver.add_constraint(cn)
+        self.assertEqual(solver.memory_report()['rows'], report['rows'])
+        self.assertEqual(solver.memory_report()['columns'], report['columns'])
+        self.assertEqual(solver.memory_report()['terms'], report['terms'])
+        self.assertEqual(solver.parameter_constraints, {})
+
+        # The tableau is still optimal.
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 30)
+        self.assertAlmostEqual(x.value, 30)
+        self.assertAlmostEqual(y.value, 60)
+
+    def test_required_failure_explanation_equalities(self):
+        "A required failure between equalities reports the equalities involved"
+        solver = SimplexSolver()
+        w = Variable('w', 0)
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        z = Variable('z', 0)
+        c1 = solver.add_constraint(Constraint(x, Constraint.EQ, y))
+        c2 = solver.add_constraint(Constraint(y, Constraint.EQ, z + 1))
+        c3 = solver.add_constraint(Constraint(z, Constraint.EQ, 5))
+        solver.add_constraint(Constraint(w, Constraint.EQ, x + 2))
+        c5 = Constraint(x, Constraint.EQ, 10)
+
+        with self.assertRaises(RequiredFailure) as context:
+            solver.add_constraint(c5)
+        self.assertEqual(set(context.exception.constraints), set([c1, c2, c3, c5]))
+
+    def test_minimal_conflict(self):
+        "Conflicting constraints can be reduced to a minimal set"
+        solver = SimplexSolver()
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        c1 = Constraint(x, Constraint.GEQ, 10)
+        c2 = Constraint(x, Constraint.GEQ, 20)
+        c3 = Constraint(y, Constraint.EQ, x)
+        c4 = Constraint(y, Constraint.LEQ, 15)
+        c5 = Constraint(x, Constraint.LEQ, 100)
+
+        self.assertEqual(set(solver.minimal_conflict([c1, c2, c3, c4, c5])), set([c2, c3, c4]))
+        self.assertEqual(solver.minimal_conflict([c1, c3, c4, c5]), [])
+
+        # Neither the solver nor the variables are affected.
+        self.assertEqual(solver.marker_vars, {})
+        self.assertEqual(x.value, 0)
+        self.assertEqual(y.value, 0)
+
+    def test_bounds_reject_infeasible(self):
+        "Bound propagation rejects infeasible constraints without solving"
+        solver = SimplexSolver()
+        solver.propagate_bounds = True
+        container = Variable('container', 0)
+        width = Variable('width', 0)
+        c1 = solver.add_constraint(Constraint(container, Constraint.EQ, 400))
+        c2 = solver.add_constraint(Constraint(width, Constraint.LEQ, container))
+        solver.add_constraint(Constraint(width, Constraint.GEQ, 0))
+        self.assertEqual(solver.bounds.upper_bound(width)[0], 400)
+
+        optimize_count = solver.optimize_count
+        rows = len(solver.rows)
+        c3 = Constraint(width, Constraint.GEQ, 500)
+        with self.assertRaises(RequiredFailure) as context:
+            solver.add_constraint(c3)
+        self.assertEqual(set(context.exception.constraints), set([c1, c2, c3]))
+        self.assertEqual(solver.optimize_count, optimize_count)
+        self.assertEqual(len(solver.rows), rows)
+        self.assertNotIn(c3, solver.marker_vars)
+
+        # Constraints that can't be proven infeasible are still solved.
+        c4 = solver.add_constraint(Constraint(width, Constraint.GEQ, 300))
+        self.assertIn(c4, solver.marker_vars)
+        self.assertTrue(300 <= width.value <= 400)
+
+    def test_bounds_accept_redundant(self):
+        "Bound propagation accepts redundant constraints without solving"
+        solver = SimplexSolver()
+        solver.propagate_bounds = True
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        solver.add_stay(y)
+        c1 = solver.add_constraint(Constraint(x, Constraint.GEQ, 200))
+        c2 = solver.add_constraint(Constraint(y, Constraint.GEQ, x))
+        self.assertAlmostEqual(y.value, 200)
+
+        rows = len(solver.rows)
+        c3 = solver.add_constraint(Constraint(y, Constraint.GEQ, 100))
+        self.assertEqual(solver.redundant_constraints[c3], frozenset([c1, c2]))
+        self.assertNotIn(c3, solver.marker_vars)
+        self.assertEqual(len(solver.rows), rows)
+
+        # Once the constraints that imply it change, the redundant
+        # constraint is added to the tableau.
+        solver.update_constant(c1, -50)
+        self.assertNotIn(c3, solver.redundant_constraints)
+        self.assertIn(c3, solver.marker_vars)
+        self.assertAlmostEqual(y.value, 100)
+
+        solver.add_edit_var(y)
+        with solver.edit():
+            solver.suggest_value(y, 0)
+        self.assertAlmostEqual(y.value, 100)
+
+        solver.remove_constraint(c3)
+        solver.add_edit_var(y)
+        with solver.edit():
+            solver.suggest_value(y, 0)
+        self.assertAlmostEqual(y.value, 50)
+
+    def test_bounds_remove_redundant(self):
+        "Redundant constraints can be removed, and restored when needed"
+        solver = SimplexSolver()
+        solver.propagate_bounds = True
+        x = Variable('x', 0)
+        c1 = solver.add_constraint(Constraint(x, Constraint.GEQ, 200))
+        c2 = solver.add_constraint(Constraint(x, Constraint.GEQ, 100))
+        c3 = solver.add_constraint(Constraint(x, Constraint.GEQ, 50))
+        self.assertEqual(set(solver.redundant_constraints), set([c2, c3]))
+
+        solver.remove_constraint(c3)
+        self.assertEqual(set(solver.redundant_constraints), set([c2]))
+
+        solver.remove_constraint(c1)
+        self.assertEqual(solver.redundant_constraints, {})
+        self.assertIn(c2, solver.marker_vars)
+        self.assertAlmostEqual(x.value, 100)
+
+    def test_bounds_update_constant_failure(self):
+        "A conflicting update keeps the constraints that it made redundant"
+        solver = SimplexSolver()
+        solver.propagate_bounds = True
+        x = Variable('x', 0)
+        eq = solver.add_constraint(Constraint(x, Constraint.EQ, 10))
+        geq = solver.add_constraint(Constraint(x, Constraint.GEQ, 5))
+        self.assertIn(geq, solver.redundant_constraints)
+
+        with self.assertRaises(RequiredFailure):
+            solver.update_constant(eq, -2)
+        self.assertEqual(eq.expression.constant, 10)
+        self.assertAlmostEqual(x.value, 10)
+        self.assertIn(geq, solver.marker_vars)
+
+        # The bounds still hold both constraints.
+        self.assertEqual(solver.get_bounds().lower_bound(x)[0], 10)
+        with self.assertRaises(RequiredFailure):
+            solver.add_constraint(Constraint(x, Constraint.LEQ, 7))
+
+        # A change that doesn't conflict is applied.
+        solver.update_constant(eq, 20)
+        self.assertAlmostEqual(x.value, 20)
+
+    def test_bounds_kept_on_remove(self):
+        "Removing a constraint only drops the bounds derived from it"
+        solver = SimplexSolver()
+        solver.propagate_bounds = True
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        c1 = solver.add_constraint(Constraint(x, Constraint.GEQ, 10))
+        c2 = solver.add_constraint(Constraint(y, Constraint.GEQ, x + 10))
+        c3 = solver.add_constraint(Constraint(x, Constraint.LEQ, 100))
+        bounds = solver.bounds
+        self.assertEqual(bounds.lower_bound(y), (20, frozenset([c1, c2])))
+
+        # A tighter bound replaces the one on x, and the one derived from it.
+        c4 = solver.add_constraint(Constraint(x, Constraint.GEQ, 50))
+        self.assertEqual(bounds.lower_bound(y), (60, frozenset([c2, c4])))
+
+        # The bounds that c3 didn't contribute to are kept.
+        solver.remove_constraint(c3)
+        self.assertIs(solver.bounds, bounds)
+        self.assertEqual(bounds.upper_bound(x)[0], float('inf'))
+        self.assertEqual(bounds.lower_bound(y)[0], 60)
+
+        # The weaker bounds are recovered by propagating again.
+        solver.remove_constraint(c4)
+        self.assertIs(solver.bounds, bounds)
+        self.assertEqual(bounds.lower_bound(x), (10, frozenset([c1])))
+        self.assertEqual(bounds.lower_bound(y), (20, frozenset([c1, c2])))
+
+        solver.update_constant(c1, -30)
+        self.assertIs(solver.bounds, bounds)
+        self.assertEqual(bounds.lower_bound(x), (30, frozenset([c1])))
+        self.assertEqual(bounds.lower_bound(y), (40, frozenset([c1, c2])))
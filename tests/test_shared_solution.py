@@ -0,0 +1,77 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import mmap
+from unittest import TestCase
+if not hasattr(TestCase, 'assertIsNotNone'):
+    # For Python2.6 compatibility
+    from unittest2 import TestCase
+try:
+    from unittest import skipIf
+except ImportError:
+    # For Python2.6 compatibility
+    from unittest2 import skipIf
+
+from cassowary import Variable, SimplexSolver
+
+# Internals
+from cassowary.expression import Constraint
+from cassowary.shared_solution import HAS_CAST, shared_memory, buffer_size, SolutionBuffer, SolutionBufferReader
+
+
+@skipIf(not HAS_CAST, 'Solution buffers require memoryview.cast(), from Python 3.3')
+class SolutionBufferTestCase(TestCase):
+    def setUp(self):
+        self.solver = SimplexSolver()
+        self.x = Variable('x', 10)
+        self.y = Variable('y', 20)
+        self.solver.add_stay(self.x)
+        self.solver.add_constraint(Constraint(self.y, Constraint.EQ, self.x * 2))
+
+    def check_publishing(self, buffer, reader):
+        self.solver.add_solution_buffer(buffer)
+
+        sequence, values = reader.read()
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(sequence % 2, 0)
+        self.assertEqual(values, [10, 20])
+
+        self.solver.add_edit_var(self.x)
+        with self.solver.edit():
+            self.solver.suggest_value(self.x, 30)
+
+        new_sequence, values = reader.read()
+        self.assertGreater(new_sequence, sequence)
+        self.assertEqual(values, [30, 60])
+
+        # Zero-copy reads are validated against the sequence number.
+        sequence = reader.begin()
+        self.assertEqual(reader.values[1], 60)
+        self.assertTrue(reader.validate(sequence))
+        buffer.publish()
+        self.assertFalse(reader.validate(sequence))
+
+        self.solver.remove_solution_buffer(buffer)
+
+    @skipIf(shared_memory is None, 'multiprocessing.shared_memory requires Python 3.8')
+    def test_shared_memory(self):
+        "Values are published into named shared memory"
+        buffer = SolutionBuffer([self.x, self.y])
+        reader = SolutionBufferReader(name=buffer.name)
+        try:
+            self.check_publishing(buffer, reader)
+        finally:
+            reader.close()
+            buffer.close()
+            buffer.unlink()
+
+    def test_mmap(self):
+        "Values can be published into any writable buffer"
+        memory = mmap.mmap(-1, buffer_size(2))
+        buffer = SolutionBuffer([self.x, self.y], buffer=memory)
+        reader = SolutionBufferReader(buffer=memory)
+        try:
+            self.check_publishing(buffer, reader)
+        finally:
+            reader.close()
+            buffer.close()
+            memory.close()
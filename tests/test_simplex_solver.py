@@ -1,14 +1,20 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
+import threading
 from unittest import TestCase
 if not hasattr(TestCase, 'assertIsNotNone'):
     # For Python2.6 compatibility
     from unittest2 import TestCase
 
-from cassowary import Variable, SimplexSolver, STRONG, REQUIRED
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from cassowary import InternalError, Variable, SimplexSolver, STRONG, MEDIUM, WEAK, REQUIRED
 
 # internals
-from cassowary.expression import Constraint
+from cassowary.expression import Constraint, Expression, SlackVariable
 
 
 class SimplexSolverTestCase(TestCase):
@@ -67,3 +73,1011 @@ class SimplexSolverTestCase(TestCase):
         self.assertEqual(a.value, 10)
         self.assertEqual(b.value, 10)
 
+
+    def test_rebuild_repairs_drift(self):
+        "Drift in the tableau is detected and repaired by a rebuild"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 2))
+
+        self.assertAlmostEqual(solver.measure_drift(), 0)
+        self.assertFalse(solver.check_drift())
+
+        # Simulate accumulated floating point error in the tableau.
+        for v, expr in solver.rows.items():
+            if v in (x, y):
+                expr.constant = expr.constant + 0.001
+        solver.set_external_variables()
+
+        self.assertGreater(solver.measure_drift(), solver.drift_tolerance)
+        self.assertTrue(solver.check_drift())
+        self.assertEqual(solver.rebuild_count, 1)
+        self.assertAlmostEqual(solver.measure_drift(), 0)
+        self.assertAlmostEqual(y.value, x.value * 2)
+
+    def test_rebuild_during_edit(self):
+        "A rebuild keeps stays and any edit session in progress"
+        solver = SimplexSolver()
+        solver.drift_check_interval = 1
+        solver.max_density = 0
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 50)
+            solver.resolve()
+            self.assertEqual(solver.rebuild_count, 1)
+            self.assertEqual(len(solver.edit_var_map), 1)
+            self.assertAlmostEqual(x.value, 50)
+            self.assertAlmostEqual(y.value, 50)
+
+            solver.suggest_value(x, 30)
+            solver.resolve()
+            self.assertAlmostEqual(x.value, 30)
+            self.assertAlmostEqual(y.value, 50)
+
+        self.assertEqual(len(solver.edit_var_map), 0)
+        self.assertAlmostEqual(x.value, 30)
+        self.assertAlmostEqual(y.value, 50)
+
+    def test_choose_subject_minimizes_fill_in(self):
+        "The subject of a new row is the variable with the shortest column"
+        solver = SimplexSolver()
+        w = Variable('w')
+        y = Variable('y')
+        q = Variable('q')
+        solver.add_constraint(Constraint(q, Constraint.EQ, y))
+        rs = [Variable('r%s' % i) for i in range(10)]
+        for i, r in enumerate(rs):
+            solver.add_constraint(Constraint(r, Constraint.EQ, w + i))
+
+        # r0 is parametric in every r row; q is parametric in one row.
+        self.assertEqual(len(solver.columns[rs[0]]), 10)
+        self.assertEqual(len(solver.columns[q]), 1)
+
+        fill_in = solver.fill_in
+        solver.add_constraint(Constraint(w + y, Constraint.EQ, 10))
+
+        self.assertIn(q, solver.rows)
+        self.assertNotIn(rs[0], solver.rows)
+        self.assertLessEqual(solver.fill_in - fill_in, 3)
+        self.assertAlmostEqual(w.value + y.value, 10)
+        for i, r in enumerate(rs):
+            self.assertAlmostEqual(r.value, w.value + i)
+
+    def test_memory_report(self):
+        "The memory report describes the solver's bookkeeping"
+        solver = SimplexSolver()
+        empty = solver.memory_report()
+        self.assertEqual(empty['rows'], 1)
+        self.assertEqual(empty['columns'], 0)
+        self.assertEqual(empty['error_vars'], 0)
+        self.assertEqual(empty['marker_vars'], 0)
+
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        cn = solver.add_constraint(Constraint(x, Constraint.EQ, y, strength=STRONG))
+        report = solver.memory_report()
+        self.assertEqual(report['error_vars'], 2)
+        self.assertEqual(report['marker_vars'], 1)
+        self.assertGreater(report['bytes'], empty['bytes'])
+
+        solver.remove_constraint(cn)
+        report = solver.memory_report()
+        for key in ('rows', 'columns', 'empty_columns', 'terms', 'error_vars', 'marker_vars'):
+            self.assertEqual(report[key], empty[key])
+        self.assertEqual(solver.slack_counter, 0)
+
+    def test_churn_memory_is_flat(self):
+        "Memory use doesn't grow under constraint add/remove churn"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+
+        def churn(i):
+            constraints = [
+                solver.add_constraint(Constraint(x, Constraint.LEQ, y)),
+                solver.add_constraint(Constraint(x, Constraint.EQ, y, strength=STRONG)),
+                solver.add_constraint(Constraint(x + i, Constraint.GEQ, 5)),
+                solver.add_constraint(Constraint(x, Constraint.EQ, 15, strength=WEAK)),
+                solver.add_stay(x, STRONG),
+            ]
+            solver.add_edit_var(y)
+            with solver.edit():
+                solver.suggest_value(y, i)
+            for cn in constraints:
+                solver.remove_constraint(cn)
+
+        for i in range(10):
+            churn(i)
+        steady = solver.memory_report()
+        counters = (solver.slack_counter, solver.dummy_counter, solver.artificial_counter)
+
+        for i in range(200):
+            churn(i)
+        report = solver.memory_report()
+        self.assertEqual((solver.slack_counter, solver.dummy_counter, solver.artificial_counter), counters)
+
+        for key, value in steady.items():
+            if key != 'bytes':
+                self.assertEqual(report[key], value, key)
+        self.assertEqual(report['empty_columns'], 0)
+        # Dictionaries don't shrink, so allow for differences in resizing.
+        self.assertLessEqual(report['bytes'], steady['bytes'] * 1.25)
+
+    def test_churn_numbering_without_pool(self):
+        "Internal variable numbers are reused when nothing is pooled"
+        solver = SimplexSolver()
+        solver.pool_size = 0
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        counter = solver.slack_counter
+
+        for i in range(1000):
+            cn = solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+            solver.remove_constraint(cn)
+        self.assertEqual(solver.slack_counter, counter)
+
+        solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+        self.assertEqual(solver.slack_counter, counter + 1)
+        names = set(v.name for v in solver.columns) | set(v.name for v in solver.rows)
+        self.assertIn('s%s' % (counter + 1), names)
+
+    def test_published_solutions(self):
+        "Each solve publishes a new, immutable solution snapshot"
+        solver = SimplexSolver()
+        solver.publish_solutions = True
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 2))
+
+        first = solver.solution
+        self.assertAlmostEqual(first[x], 10)
+        self.assertAlmostEqual(first[y], 20)
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 30)
+
+        second = solver.solution
+        self.assertGreater(second.version, first.version)
+        self.assertAlmostEqual(second[x], 30)
+        self.assertAlmostEqual(second[y], 60)
+
+        # The earlier snapshot is unaffected.
+        self.assertAlmostEqual(first[x], 10)
+        self.assertAlmostEqual(first[y], 20)
+
+    def test_solutions_are_never_torn(self):
+        "A reader on another thread always sees a complete solution"
+        solver = SimplexSolver()
+        solver.publish_solutions = True
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 2))
+        solver.add_edit_var(x)
+
+        done = threading.Event()
+        torn = []
+
+        def reader():
+            while not done.is_set():
+                solution = solver.solution
+                if abs(solution[y] - 2 * solution[x]) > 1e-6:
+                    torn.append(solution)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            with solver.edit():
+                for i in range(500):
+                    solver.suggest_value(x, i)
+                    solver.resolve()
+        finally:
+            done.set()
+            thread.join()
+
+        self.assertEqual(torn, [])
+        self.assertAlmostEqual(solver.solution[x], 499)
+
+    def test_incremental_stay_reset(self):
+        "Resetting stays visits only the stay rows that have changed"
+        solver = SimplexSolver()
+        points = [Variable('p%s' % i, i * 10) for i in range(20)]
+        for p in points:
+            solver.add_stay(p)
+        for a, b in zip(points, points[1:]):
+            solver.add_constraint(Constraint(a + 5, Constraint.LEQ, b))
+
+        def stay_rows():
+            return [
+                solver.rows[v]
+                for pair in solver.stay_error_vars
+                for v in pair
+                if v in solver.rows
+            ]
+
+        solver.add_edit_var(points[5])
+        with solver.edit():
+            self.assertEqual(len(solver.changed_stay_rows), 0)
+            for value in [60, 200, 10, 120]:
+                solver.suggest_value(points[5], value)
+                solver.resolve()
+
+                self.assertEqual(len(solver.changed_stay_rows), 0)
+                for expr in stay_rows():
+                    self.assertEqual(expr.constant, 0.0)
+
+        for a, b in zip(points, points[1:]):
+            self.assertGreaterEqual(b.value, a.value + 5 - 1e-8)
+
+    def test_persistent_edit_vars(self):
+        "Persistent edit variables are reused across edit sessions"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+        solver.add_constraint(Constraint(y, Constraint.EQ, 100, strength=WEAK, weight=0.5))
+
+        cn = solver.add_edit_var(x, persistent=True)
+        with solver.edit():
+            solver.suggest_value(x, 50)
+        self.assertAlmostEqual(x.value, 50)
+        self.assertAlmostEqual(y.value, 50)
+
+        # The edit constraint remains registered, but has no influence.
+        self.assertEqual(len(solver.edit_var_map), 0)
+        self.assertIn(x, solver.dormant_edit_vars)
+        self.assertIn(cn, solver.marker_vars)
+        constraints = len(solver.marker_vars)
+        slack_counter = solver.slack_counter
+
+        # Reactivating reuses the same constraint.
+        self.assertIs(solver.add_edit_var(x, persistent=True), cn)
+        with solver.edit():
+            solver.suggest_value(x, 70)
+        self.assertAlmostEqual(x.value, 70)
+        self.assertAlmostEqual(y.value, 70)
+        self.assertEqual(len(solver.marker_vars), constraints)
+        self.assertEqual(solver.slack_counter, slack_counter)
+
+        # A dormant edit variable can be removed entirely.
+        solver.remove_edit_var(x)
+        self.assertEqual(len(solver.dormant_edit_vars), 0)
+        self.assertNotIn(cn, solver.marker_vars)
+        self.assertAlmostEqual(x.value, 70)
+
+    def test_persistent_edit_var_strength(self):
+        "A dormant edit variable keeps its strength when it is reactivated"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        solver.add_stay(x)
+        solver.add_constraint(Constraint(x, Constraint.EQ, 0, strength=MEDIUM))
+
+        cn = solver.add_edit_var(x, persistent=True)
+        with solver.edit():
+            solver.suggest_value(x, 50)
+            solver.resolve()
+            self.assertAlmostEqual(x.value, 50)
+
+        # Weakening the dormant edit constraint survives reactivation.
+        solver.change_strength(cn, WEAK)
+        self.assertIs(solver.add_edit_var(x), cn)
+        self.assertEqual(cn.strength, WEAK)
+        with solver.edit():
+            solver.suggest_value(x, 70)
+            solver.resolve()
+            self.assertAlmostEqual(x.value, 0)
+
+        # An explicit strength still replaces it.
+        self.assertIs(solver.add_edit_var(x, STRONG), cn)
+        self.assertEqual(cn.strength, STRONG)
+        with solver.edit():
+            solver.suggest_value(x, 70)
+            solver.resolve()
+            self.assertAlmostEqual(x.value, 70)
+
+        with self.assertRaises(InternalError):
+            solver.add_edit_var(x, REQUIRED)
+        self.assertIn(x, solver.dormant_edit_vars)
+
+    def test_persistent_edit_vars_match_transient(self):
+        "Persistent edit variables give the same results as transient ones"
+        results = []
+        for persistent in (False, True):
+            solver = SimplexSolver()
+            x = Variable('x', 10)
+            y = Variable('y', 20)
+            solver.add_stay(x)
+            solver.add_stay(y)
+            solver.add_constraint(Constraint(x + 10, Constraint.LEQ, y))
+            solver.add_constraint(Constraint(x, Constraint.EQ, 0, strength=WEAK, weight=0.5))
+
+            values = []
+            for target in [50, 80, 20, 35]:
+                solver.add_edit_var(x, persistent=persistent)
+                with solver.edit():
+                    solver.suggest_value(x, target)
+                    solver.resolve()
+                    values.append((x.value, y.value))
+                values.append((x.value, y.value))
+
+                # Something else moves x while the edit is dormant.
+                solver.add_edit_var(y)
+                with solver.edit():
+                    solver.suggest_value(y, target / 2)
+                values.append((x.value, y.value))
+            results.append(values)
+
+        for transient, persistent in zip(*results):
+            self.assertAlmostEqual(transient[0], persistent[0])
+            self.assertAlmostEqual(transient[1], persistent[1])
+
+    def test_rebuild_keeps_dormant_edit_vars(self):
+        "A rebuild keeps persistent edit variables dormant"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        solver.add_stay(x)
+        solver.add_edit_var(x, persistent=True)
+        with solver.edit():
+            solver.suggest_value(x, 50)
+
+        solver.rebuild()
+        self.assertIn(x, solver.dormant_edit_vars)
+        self.assertEqual(len(solver.edit_var_map), 0)
+        self.assertAlmostEqual(x.value, 50)
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 30)
+        self.assertAlmostEqual(x.value, 30)
+
+    def test_set_edited_values(self):
+        "Many values can be edited with a single resolve"
+        def setup():
+            solver = SimplexSolver()
+            points = [Variable('p%s' % i, i * 10) for i in range(30)]
+            for p in points:
+                solver.add_stay(p)
+            for a, b in zip(points, points[1:]):
+                solver.add_constraint(Constraint(a, Constraint.LEQ, b))
+            return solver, points
+
+        # Editing the values one at a time...
+        solver, points = setup()
+        optimize_count = solver.optimize_count
+        for i, p in enumerate(points):
+            solver.set_edited_value(p, i * 20)
+        sequential = solver.optimize_count - optimize_count
+
+        # ... takes many more optimizations than editing them together.
+        solver, points = setup()
+        outsider = Variable('outsider', 1)
+        values = dict((p, i * 20) for i, p in enumerate(points))
+        values[outsider] = 42
+
+        optimize_count = solver.optimize_count
+        solver.set_edited_values(values)
+        self.assertLess(solver.optimize_count - optimize_count, sequential / 2)
+
+        for i, p in enumerate(points):
+            self.assertAlmostEqual(p.value, i * 20)
+        self.assertEqual(outsider.value, 42)
+        self.assertEqual(len(solver.edit_var_map), 0)
+        self.assertEqual(len(solver.marker_vars), 59)
+
+    def test_set_edited_values_edit_vars(self):
+        "Existing edit variables are suggested directly, and stay registered"
+        solver = SimplexSolver()
+        v = Variable('v', 0)
+        w = Variable('w', 0)
+        x = Variable('x', 0)
+        for var in [v, w, x]:
+            solver.add_stay(var)
+        solver.add_constraint(Constraint(x, Constraint.GEQ, w))
+        markers = len(solver.marker_vars)
+
+        solver.add_edit_var(w)
+        solver.add_edit_var(v)
+        solver.set_edited_values({w: 5, x: 8})
+        self.assertAlmostEqual(w.value, 5)
+        self.assertAlmostEqual(x.value, 8)
+        self.assertEqual(set(solver.edit_var_map), set([v, w]))
+        self.assertEqual(len(solver.marker_vars), markers + 2)
+
+        # Inside an edit session, the caller's edit variables are kept too.
+        with solver.edit():
+            solver.suggest_value(v, 3)
+            solver.set_edited_values({w: 7, x: 9})
+            self.assertAlmostEqual(v.value, 3)
+            self.assertAlmostEqual(w.value, 7)
+            self.assertAlmostEqual(x.value, 9)
+            self.assertEqual(set(solver.edit_var_map), set([v, w]))
+        self.assertEqual(len(solver.edit_var_map), 0)
+        self.assertEqual(len(solver.marker_vars), markers)
+
+    def test_set_edited_value(self):
+        "A single value can be edited"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x)
+        solver.add_stay(y)
+        solver.add_constraint(Constraint(x, Constraint.LEQ, y))
+
+        solver.set_edited_value(x, 30)
+        self.assertAlmostEqual(x.value, 30)
+        self.assertAlmostEqual(y.value, 30)
+        self.assertEqual(len(solver.edit_var_map), 0)
+
+    def test_solution_cache(self):
+        "Revisited edit values are restored from the solution cache"
+        solver = SimplexSolver()
+        solver.solution_cache_size = 2
+        width = Variable('width', 100)
+        left = Variable('left', 0)
+        right = Variable('right', 100)
+        solver.add_stay(left)
+        solver.add_stay(right)
+        solver.add_constraint(Constraint(right, Constraint.EQ, left + width))
+        solver.add_constraint(Constraint(left, Constraint.EQ, width * 0.25))
+
+        pivots = []
+        pivot = solver.pivot
+
+        def counting_pivot(entry_var, exit_var):
+            pivots.append((entry_var, exit_var))
+            pivot(entry_var, exit_var)
+        solver.pivot = counting_pivot
+
+        solver.add_edit_var(width)
+        with solver.edit():
+            # A solution is copied the second time it is seen.
+            solver.suggest_value(width, 200)
+            solver.resolve()
+            self.assertEqual(len(solver.solution_cache), 0)
+            for value in [300, 200, 300]:
+                solver.suggest_value(width, value)
+                solver.resolve()
+            self.assertEqual(solver.cache_misses, 4)
+            self.assertEqual(solver.cache_hits, 0)
+            self.assertEqual(len(solver.solution_cache), 2)
+
+            # A cache hit doesn't pivot.
+            solver.suggest_value(width, 200)
+            count = len(pivots)
+            solver.resolve()
+            self.assertEqual(solver.cache_hits, 1)
+            self.assertEqual(len(pivots), count)
+            self.assertAlmostEqual(width.value, 200)
+            self.assertAlmostEqual(left.value, 50)
+            self.assertAlmostEqual(right.value, 250)
+
+            # Solving carries on from a restored tableau.
+            for value in [400, 400]:
+                solver.suggest_value(width, value)
+                solver.resolve()
+                self.assertAlmostEqual(left.value, 100)
+                self.assertAlmostEqual(right.value, 500)
+            self.assertEqual(solver.cache_misses, 6)
+
+            # The least recently used entry was evicted.
+            self.assertEqual(len(solver.solution_cache), 2)
+            solver.suggest_value(width, 300)
+            solver.resolve()
+            self.assertEqual(solver.cache_misses, 7)
+            self.assertAlmostEqual(left.value, 75)
+            self.assertAlmostEqual(right.value, 375)
+
+    def test_solution_cache_invalidation(self):
+        "Changing the constraints invalidates the solution cache"
+        solver = SimplexSolver()
+        solver.solution_cache_size = 10
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        solver.add_stay(y)
+        cn = solver.add_constraint(Constraint(y, Constraint.EQ, x * 2))
+        solver.add_edit_var(x, persistent=True)
+
+        with solver.edit():
+            solver.suggest_value(x, 10)
+            solver.resolve()
+            self.assertEqual(len(solver.solution_cache), 0)
+        self.assertAlmostEqual(y.value, 20)
+        self.assertEqual(len(solver.solution_cache), 1)
+        version = solver.constraint_version
+
+        # A persistent edit variable keeps the cache valid between sessions.
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 10)
+        self.assertEqual(solver.cache_hits, 1)
+        self.assertEqual(solver.constraint_version, version)
+
+        solver.remove_constraint(cn)
+        self.assertEqual(len(solver.solution_cache), 0)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x * 3))
+        self.assertGreater(solver.constraint_version, version)
+
+        solver.add_edit_var(x)
+        with solver.edit():
+            solver.suggest_value(x, 10)
+        self.assertEqual(solver.cache_hits, 1)
+        self.assertAlmostEqual(y.value, 30)
+
+    def test_solution_cache_symbolic(self):
+        "The solution cache works with a symbolic objective"
+        solver = SimplexSolver(symbolic=True)
+        solver.solution_cache_size = 4
+        x = Variable('x', 0)
+        y = Variable('y', 0)
+        solver.add_stay(y, strength=WEAK)
+        solver.add_constraint(Constraint(y, Constraint.EQ, x + 10, strength=STRONG))
+        solver.add_edit_var(x)
+        with solver.edit():
+            for value in [10, 20, 10, 20, 10]:
+                solver.suggest_value(x, value)
+                solver.resolve()
+                self.assertAlmostEqual(y.value, value + 10)
+            self.assertEqual(solver.cache_hits, 1)
+
+    def test_parametric_edits(self):
+        "Edits within the range of the basis are evaluated from an affine map"
+        def setup(parametric):
+            solver = SimplexSolver()
+            solver.parametric = parametric
+            x = Variable('x', 10)
+            y = Variable('y', 10)
+            left = Variable('left', 0)
+            right = Variable('right', 100)
+            mid = Variable('mid', 50)
+            solver.add_stay(left)
+            solver.add_stay(right)
+            solver.add_stay(mid, strength=WEAK)
+            solver.add_constraint(Constraint(mid * 2, Constraint.EQ, left + right))
+            solver.add_constraint(Constraint(right, Constraint.GEQ, left + 10))
+            solver.add_constraint(Constraint(left, Constraint.GEQ, 0))
+            solver.add_constraint(Constraint(right, Constraint.LEQ, 500))
+            solver.add_constraint(Constraint(x, Constraint.EQ, left))
+            solver.add_constraint(Constraint(y, Constraint.EQ, right))
+            solver.add_edit_var(x)
+            solver.add_edit_var(y)
+            return solver, [x, y, left, right, mid]
+
+        fast, fast_vars = setup(True)
+        slow, slow_vars = setup(False)
+
+        moves = [
+            (20, 120), (30, 140), (35, 160), (40, 170), (45, 180), (50, 190),
+            (-50, 200), (40, 40), (45, 600), (60, 300), (60, 310), (70, 320),
+        ]
+        with fast.edit():
+            with slow.edit():
+                for x, y in moves:
+                    fast.suggest_value(fast_vars[0], x)
+                    fast.suggest_value(fast_vars[1], y)
+                    fast.resolve()
+                    slow.suggest_value(slow_vars[0], x)
+                    slow.suggest_value(slow_vars[1], y)
+                    slow.resolve()
+                    for f, s in zip(fast_vars, slow_vars):
+                        self.assertAlmostEqual(f.value, s.value)
+
+        # Moves that didn't change the basis didn't need the tableau ...
+        self.assertGreaterEqual(fast.parametric_count, 6)
+        self.assertEqual(slow.parametric_count, 0)
+        self.assertIsNone(fast.affine_map)
+
+        # ... but the tableau was brought up to date afterwards.
+        fast.add_edit_var(fast_vars[1])
+        slow.add_edit_var(slow_vars[1])
+        with fast.edit():
+            fast.suggest_value(fast_vars[1], 200)
+        with slow.edit():
+            slow.suggest_value(slow_vars[1], 200)
+        for f, s in zip(fast_vars, slow_vars):
+            self.assertAlmostEqual(f.value, s.value)
+
+    def test_sweep(self):
+        "A sweep gives the same results as resolving each value in turn"
+        if numpy is None:
+            self.skipTest('numpy is not installed')
+
+        def setup():
+            solver = SimplexSolver()
+            width = Variable('width', 400)
+            left = Variable('left', 0)
+            right = Variable('right', 400)
+            sidebar = Variable('sidebar', 100)
+            content = Variable('content', 300)
+            solver.add_stay(width)
+            solver.add_stay(sidebar, strength=WEAK)
+            solver.add_constraint(Constraint(left, Constraint.EQ, 0))
+            solver.add_constraint(Constraint(right, Constraint.EQ, left + width))
+            solver.add_constraint(Constraint(width, Constraint.EQ, sidebar + content))
+            solver.add_constraint(Constraint(sidebar, Constraint.GEQ, 100))
+            solver.add_constraint(Constraint(sidebar, Constraint.LEQ, width * 0.25))
+            solver.add_constraint(Constraint(content, Constraint.GEQ, 200))
+            solver.add_constraint(Constraint(content, Constraint.LEQ, 1000))
+            return solver, width, [left, right, sidebar, content, width]
+
+        values = [800, 320, 1500, 640, 320, 2560, 1024, 400, 1333.5]
+
+        solver, width, variables = setup()
+        solver.add_edit_var(width)
+        expected = []
+        with solver.edit():
+            for value in sorted(values):
+                solver.suggest_value(width, value)
+                solver.resolve()
+                expected.append([v.value for v in variables])
+        order = sorted(range(len(values)), key=lambda i: values[i])
+        expected = [expected[order.index(i)] for i in range(len(values))]
+
+        solver, width, variables = setup()
+        results = solver.sweep(width, values, variables)
+        self.assertEqual(results.shape, (len(values), len(variables)))
+        for row, expected_row in zip(results.tolist(), expected):
+            for value, expected_value in zip(row, expected_row):
+                self.assertAlmostEqual(value, expected_value)
+
+        # Values between breakpoints are computed without resolving.
+        self.assertLess(solver.resolve_count, len(values))
+
+        # The solver is left where it started.
+        self.assertEqual(solver.edit_var_map, {})
+        self.assertAlmostEqual(width.value, 400)
+        self.assertAlmostEqual(variables[1].value, 400)
+        self.assertIsNone(solver.affine_map)
+
+        # By default, every external variable is reported.
+        results = solver.sweep(width, [500])
+        self.assertEqual(results.shape, (1, 5))
+
+        # Edit variables that were already registered are left alone.
+        sidebar = variables[2]
+        solver.add_edit_var(sidebar)
+        results = solver.sweep(width, [800], variables)
+        self.assertAlmostEqual(results[0][2], 100)
+        self.assertAlmostEqual(results[0][3], 700)
+        self.assertEqual(list(solver.edit_var_map), [sidebar])
+
+        solver.add_edit_var(width)
+        solver.sweep(width, [800])
+        self.assertEqual(set(solver.edit_var_map), set([sidebar, width]))
+
+    def test_variable_ids(self):
+        "Variables are numbered in order of creation"
+        a = Variable('b')
+        b = Variable('a')
+        self.assertLess(a.id, b.id)
+
+        solver = SimplexSolver()
+        solver.add_constraint(Constraint(a, Constraint.GEQ, b))
+        slack = solver.marker_vars[list(solver.marker_vars)[0]]
+        self.assertGreater(slack.id, b.id)
+
+    def test_reproducible_pivots(self):
+        "The same system is always solved with the same sequence of pivots"
+        def solve():
+            solver = SimplexSolver()
+            pivots = []
+            pivot = solver.pivot
+
+            def recording_pivot(entry_var, exit_var):
+                pivots.append((entry_var.name, exit_var.name))
+                pivot(entry_var, exit_var)
+            solver.pivot = recording_pivot
+
+            # Create some garbage, so the new variables are allocated at
+            # different addresses each time.
+            garbage = [Variable('garbage') for i in range(len(attempts) * 7)]
+
+            points = [Variable('p%s' % i, i * 10) for i in range(12)]
+            for p in points:
+                solver.add_stay(p, strength=WEAK)
+            for p, q in zip(points, points[1:]):
+                solver.add_constraint(Constraint(q, Constraint.GEQ, p + 5))
+            for p, q in zip(points, points[2:]):
+                solver.add_constraint(Constraint(q, Constraint.LEQ, p + 30, strength=STRONG))
+            solver.add_constraint(Constraint(points[-1], Constraint.LEQ, 200))
+
+            for p in points[::3]:
+                solver.add_edit_var(p)
+            with solver.edit():
+                for step in range(5):
+                    for i, p in enumerate(points[::3]):
+                        solver.suggest_value(p, (i + 1) * step * 17)
+                    solver.resolve()
+            attempts.append(garbage)
+            return pivots, [p.value for p in points]
+
+        attempts = []
+        first = solve()
+        for i in range(3):
+            self.assertEqual(solve(), first)
+
+    def test_optimize_ignores_noise(self):
+        "A negligible objective coefficient doesn't stop the optimization"
+        solver = SimplexSolver()
+        noise = SlackVariable('s', 1)
+        slack = SlackVariable('s', 2)
+        basic = SlackVariable('s', 3)
+        row = Expression(constant=10.0)
+        row.set_variable(slack, -1.0)
+        solver.add_row(basic, row)
+        # The noise is older than the slack, so it would be chosen first.
+        z_row = solver.rows[solver.objective]
+        z_row.set_variable(noise, -1e-12)
+        z_row.set_variable(slack, -1.0)
+        solver.note_added_variable(noise, solver.objective)
+        solver.note_added_variable(slack, solver.objective)
+
+        self.assertTrue(solver.optimize(solver.objective))
+        self.assertIn(slack, solver.rows)
+        self.assertNotIn(basic, solver.rows)
+        self.assertAlmostEqual(solver.rows[solver.objective].constant, -10)
+
+    def test_optimize_entering_column(self):
+        "The entering variable is chosen to minimize fill-in"
+        def optimize(degenerate_limit):
+            solver = SimplexSolver()
+            solver.degenerate_limit = degenerate_limit
+            long = SlackVariable('s', 1)
+            short = SlackVariable('s', 2)
+            for constant, v, c in [(10.0, long, -1.0), (10.0, long, 1.0), (10.0, short, -1.0)]:
+                row = Expression(constant=constant)
+                row.set_variable(v, c)
+                solver.add_row(SlackVariable('s', 3), row)
+            z_row = solver.rows[solver.objective]
+            for v in [long, short]:
+                z_row.set_variable(v, -1.0)
+                solver.note_added_variable(v, solver.objective)
+
+            entry_vars = []
+            pivot = solver.pivot
+
+            def recording_pivot(entry_var, exit_var):
+                entry_vars.append(entry_var)
+                pivot(entry_var, exit_var)
+            solver.pivot = recording_pivot
+
+            self.assertTrue(solver.optimize(solver.objective))
+            self.assertAlmostEqual(solver.rows[solver.objective].constant, -20)
+            return entry_vars, long, short
+
+        # The shorter column enters first...
+        entry_vars, long, short = optimize(50)
+        self.assertEqual(entry_vars, [short, long])
+
+        # ... unless Bland's rule is in force.
+        entry_vars, long, short = optimize(0)
+        self.assertEqual(entry_vars, [long, short])
+
+    def test_dual_rules(self):
+        "Every dual simplex rule finds the same solution"
+        def drag(dual_rule, harris_tolerance):
+            solver = SimplexSolver()
+            solver.dual_rule = dual_rule
+            solver.harris_tolerance = harris_tolerance
+            points = [Variable('p%s' % i, i * 10) for i in range(10)]
+            for p in points:
+                solver.add_stay(p, strength=WEAK)
+            for p, q in zip(points, points[1:]):
+                solver.add_constraint(Constraint(q, Constraint.GEQ, p + 10))
+            solver.add_constraint(Constraint(points[0], Constraint.GEQ, 0))
+            solver.add_constraint(Constraint(points[-1], Constraint.LEQ, 300))
+
+            solver.add_edit_var(points[4])
+            values = []
+            with solver.edit():
+                for x in [60, 120, 250, 10, 180, 0, 90]:
+                    solver.suggest_value(points[4], x)
+                    solver.resolve()
+                    values.append([p.value for p in points])
+            return solver, values
+
+        solver, expected = drag('first', None)
+        self.assertEqual(len(solver.dual_pivot_counts), 8)
+        self.assertGreater(sum(solver.dual_pivot_counts), 0)
+
+        for dual_rule in ['first', 'most_infeasible', 'steepest_edge']:
+            for harris_tolerance in [None, 1e-9]:
+                solver, values = drag(dual_rule, harris_tolerance)
+                for row, expected_row in zip(values, expected):
+                    for value, expected_value in zip(row, expected_row):
+                        self.assertAlmostEqual(value, expected_value)
+
+        solver = SimplexSolver()
+        solver.dual_rule = 'fastest'
+        x = Variable('x', 0)
+        solver.add_stay(x)
+        solver.add_constraint(Constraint(x, Constraint.GEQ, 0))
+        solver.add_edit_var(x)
+        with self.assertRaises(InternalError):
+            with solver.edit():
+                solver.suggest_value(x, -10)
+
+    def test_budget(self):
+        "A solve that runs out of budget can be resumed"
+        def build():
+            solver = SimplexSolver()
+            points = [Variable('p%s' % i, i * 10) for i in range(10)]
+            for p in points:
+                solver.add_stay(p, strength=WEAK)
+            for p, q in zip(points, points[1:]):
+                solver.add_constraint(Constraint(q, Constraint.GEQ, p + 10))
+            solver.add_constraint(Constraint(points[0], Constraint.GEQ, 0))
+            solver.add_constraint(Constraint(points[-1], Constraint.LEQ, 300))
+            solver.add_edit_var(points[4])
+            return solver, points
+
+        moves = [60, 120, 250, 10, 180, 0, 90]
+        solver, points = build()
+        expected = []
+        with solver.edit():
+            for x in moves:
+                solver.suggest_value(points[4], x)
+                self.assertTrue(solver.resolve())
+                expected.append([p.value for p in points])
+
+        solver, points = build()
+        solver.max_pivots = 1
+        interrupted = 0
+        with solver.edit():
+            for x, expected_row in zip(moves, expected):
+                solver.suggest_value(points[4], x)
+                before = [p.value for p in points]
+                while not solver.resolve():
+                    interrupted = interrupted + 1
+                    self.assertFalse(solver.optimal)
+                    if solver.infeasible_rows:
+                        # The previous solution is kept until the basis is
+                        # feasible again.
+                        self.assertEqual([p.value for p in points], before)
+                self.assertTrue(solver.optimal)
+                for value, expected_value in zip([p.value for p in points], expected_row):
+                    self.assertAlmostEqual(value, expected_value)
+        self.assertGreater(interrupted, 0)
+
+        # An interrupted solve is finished before the tableau is changed.
+        solver, points = build()
+        solver.time_budget = 0.0
+        solver.begin_edit()
+        solver.suggest_value(points[4], 10)
+        self.assertFalse(solver.resolve())
+        solver.time_budget = None
+        solver.end_edit()
+        self.assertTrue(solver.optimal)
+        self.assertAlmostEqual(points[4].value, 40)
+
+    def test_bland(self):
+        "Bland's rule finds the same solution"
+        def drag(degenerate_limit):
+            solver = SimplexSolver()
+            solver.degenerate_limit = degenerate_limit
+            solver.dual_rule = 'steepest_edge'
+            points = [Variable('p%s' % i, 0) for i in range(8)]
+            for p in points:
+                solver.add_stay(p, strength=WEAK)
+            # Every point starts at the same place, so the first solve is
+            # full of degenerate pivots.
+            for p, q in zip(points, points[1:]):
+                solver.add_constraint(Constraint(q, Constraint.GEQ, p))
+            solver.add_constraint(Constraint(points[0], Constraint.GEQ, 0))
+            solver.add_edit_var(points[3])
+            values = []
+            with solver.edit():
+                for x in [50, 20, 80, 0]:
+                    solver.suggest_value(points[3], x)
+                    self.assertTrue(solver.resolve())
+                    values.append([p.value for p in points])
+            return values
+
+        expected = drag(50)
+        for row, expected_row in zip(drag(0), expected):
+            for value, expected_value in zip(row, expected_row):
+                self.assertAlmostEqual(value, expected_value)
+
+    def test_pooling(self):
+        "Internal variables and rows are reused after a constraint is removed"
+        solver = SimplexSolver()
+        x = Variable('x', 10)
+        y = Variable('y', 20)
+        solver.add_stay(x, strength=WEAK)
+        solver.add_stay(y, strength=WEAK)
+
+        used = set()
+        for i in range(10):
+            constraints = [
+                solver.add_constraint(Constraint(x, Constraint.GEQ, 30 + i)),
+                solver.add_constraint(Constraint(y, Constraint.EQ, x + 5, strength=STRONG)),
+                solver.add_constraint(Constraint(x + y, Constraint.EQ, 100)),
+            ]
+            self.assertAlmostEqual(x.value, 47.5)
+            self.assertAlmostEqual(y.value, 52.5)
+            for cn in constraints:
+                used.add(solver.marker_vars[cn])
+                used.update(solver.error_vars.get(cn, ()))
+            for cn in constraints:
+                solver.remove_constraint(cn)
+            self.assertAlmostEqual(x.value, 47.5)
+
+        # Only the first round of constraints needed new variables.
+        self.assertEqual(len(used), 4)
+        self.assertTrue(solver.variable_pool)
+        self.assertTrue(solver.row_pool)
+        for pool in solver.variable_pool.values():
+            for v in pool:
+                self.assertNotIn(v, solver.rows)
+                self.assertNotIn(v, solver.columns)
+
+        solver.pool_size = 0
+        solver.variable_pool.clear()
+        del solver.row_pool[:]
+        cn = solver.add_constraint(Constraint(x, Constraint.GEQ, 0))
+        solver.remove_constraint(cn)
+        self.assertFalse(solver.variable_pool.get('s'))
+        self.assertFalse(solver.row_pool)
+
+    def test_pivot(self):
+        "A pivot has the same result as the separate tableau operations"
+        solver = SimplexSolver()
+        points = [Variable('p%s' % i, i * 10) for i in range(8)]
+        for p in points:
+            solver.add_stay(p, strength=WEAK)
+        for p, q in zip(points, points[1:]):
+            solver.add_constraint(Constraint(q, Constraint.GEQ, p + 10))
+        for p, q in zip(points, points[2:]):
+            solver.add_constraint(Constraint(q, Constraint.LEQ, p + 40, strength=STRONG))
+        solver.add_constraint(Constraint(points[0], Constraint.GEQ, 0))
+
+        def state():
+            return (
+                dict((v, (expr.constant, dict(expr.terms))) for v, expr in solver.rows.items()),
+                dict((v, set(col)) for v, col in solver.columns.items()),
+                set(solver.infeasible_rows),
+                set(solver.external_rows),
+                set(solver.external_parametric_vars),
+                set(solver.changed_stay_rows),
+            )
+
+        snapshot = solver.snapshot()
+        pivots = [
+            (entry_var, exit_var)
+            for exit_var, expr in sorted(solver.rows.items(), key=lambda item: item[0].id)
+            if exit_var is not solver.objective
+            for entry_var in sorted(expr.terms, key=lambda v: v.id)
+            if entry_var.is_pivotable
+        ]
+        self.assertGreater(len(pivots), 10)
+        for entry_var, exit_var in pivots:
+            solver.restore(snapshot)
+            fill_in = solver.fill_in
+            p_expr = solver.remove_row(exit_var)
+            p_expr.change_subject(exit_var, entry_var)
+            solver.substitute_out(entry_var, p_expr)
+            solver.add_row(entry_var, p_expr)
+            expected = state()
+            expected_fill_in = solver.fill_in - fill_in
+
+            solver.restore(snapshot)
+            fill_in = solver.fill_in
+            solver.pivot(entry_var, exit_var)
+            self.assertEqual(state(), expected)
+            self.assertEqual(solver.fill_in - fill_in, expected_fill_in)
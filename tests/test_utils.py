@@ -0,0 +1,51 @@
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from unittest import TestCase
+if not hasattr(TestCase, 'assertIsNotNone'):
+    # For Python2.6 compatibility
+    from unittest2 import TestCase
+
+from cassowary import SymbolicWeight, STRONG, MEDIUM, WEAK
+
+# Internals
+from cassowary.utils import EPSILON
+
+
+class SymbolicWeightTestCase(TestCase):
+    def test_from_strength(self):
+        "Numeric strengths map onto one level per base-1000 digit"
+        self.assertEqual(SymbolicWeight.from_strength(STRONG).levels, (1.0, 0.0, 0.0))
+        self.assertEqual(SymbolicWeight.from_strength(MEDIUM).levels, (0.0, 1.0, 0.0))
+        self.assertEqual(SymbolicWeight.from_strength(WEAK).levels, (0.0, 0.0, 1.0))
+        self.assertEqual(SymbolicWeight.from_strength(2 * STRONG + 3).levels, (2.0, 0.0, 3.0))
+        self.assertAlmostEqual(float(SymbolicWeight(1, 0, 0)), STRONG)
+
+    def test_lexicographic_comparison(self):
+        "A higher level always outweighs any amount of a lower level"
+        strong = SymbolicWeight(1, 0, 0)
+        lots_of_medium = SymbolicWeight(0, 1e12, 0)
+        self.assertTrue(lots_of_medium < strong)
+        self.assertTrue(strong > lots_of_medium)
+        self.assertTrue(SymbolicWeight(0, -1, 5) < 0)
+        self.assertTrue(SymbolicWeight(0, 0, 0) == 0)
+        self.assertTrue(SymbolicWeight(1, 0) == SymbolicWeight(1, 0, 0))
+
+    def test_noise_is_ignored(self):
+        "Levels within EPSILON of zero don't decide a comparison"
+        weight = SymbolicWeight(EPSILON / 10, -1, 0)
+        self.assertTrue(weight < 0)
+        self.assertFalse(weight >= -EPSILON)
+        self.assertTrue(SymbolicWeight(-EPSILON / 10, 0, 0) >= -EPSILON)
+
+    def test_arithmetic(self):
+        "Symbolic weights can be combined with each other and with scalars"
+        weight = SymbolicWeight(1, 2, 3)
+        self.assertEqual((weight + SymbolicWeight(0, 0, 1, 4)).levels, (1.0, 2.0, 4.0, 4.0))
+        self.assertEqual((0.0 + weight).levels, (1.0, 2.0, 3.0))
+        self.assertEqual((weight * 2).levels, (2.0, 4.0, 6.0))
+        self.assertEqual((2 * weight).levels, (2.0, 4.0, 6.0))
+        self.assertEqual((weight / 2).levels, (0.5, 1.0, 1.5))
+        self.assertEqual((-weight).levels, (-1.0, -2.0, -3.0))
+        self.assertEqual((weight - weight).levels, (0.0, 0.0, 0.0))
+        self.assertFalse(weight - weight)
+        self.assertAlmostEqual(abs(SymbolicWeight(1, -5, 2)), 5.0)